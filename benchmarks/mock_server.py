@@ -0,0 +1,129 @@
+"""Local stand-in for the OpenCage API, for benchmarks.
+
+Serves ``/geocode/v1/json`` from an aiohttp server running on its own
+thread and event loop, with configurable latency, server errors and
+429 responses. Nothing leaves the machine, and a fixed seed makes the
+error pattern the same on every run.
+"""
+
+import asyncio
+import json
+import random
+import threading
+
+from aiohttp import web
+
+RESULT = {
+    'components': {
+        '_type': 'city',
+        'city': 'Münster',
+        'country': 'Germany',
+        'country_code': 'de',
+        'postcode': '48143',
+        'state': 'North Rhine-Westphalia',
+    },
+    'confidence': 7,
+    'formatted': 'Münster, North Rhine-Westphalia, Germany',
+    'geometry': {'lat': 51.9625101, 'lng': 7.6251879},
+    'bounds': {
+        'northeast': {'lat': 52.0600251, 'lng': 7.7743634},
+        'southwest': {'lat': 51.8401448, 'lng': 7.4737853},
+    },
+}
+
+
+class MockServer:
+    """Fake geocoding API on ``localhost``.
+
+    Use as a context manager; ``domain`` is then the ``localhost:port``
+    value to pass to ``OpenCageGeocode`` together with ``protocol='http'``.
+
+    Args:
+        latency: Seconds each response is delayed by.
+        error_rate: Fraction of requests answered with a 503 and a non-JSON body.
+        rate_limit_rate: Fraction of requests answered with a 429.
+        results: Number of results in each response.
+        seed: Seed for choosing which requests fail.
+        port: Port to listen on, by default a free one.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, results=1, seed=0, port=0):
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests = 0
+        self.domain = None
+        self._random = random.Random(seed)
+        self._body = json.dumps({
+            'rate': {'limit': 1000000, 'remaining': 999999, 'reset': 4102444800},
+            'results': [RESULT] * results,
+            'status': {'code': 200, 'message': 'OK'},
+            'total_results': results,
+        })
+        self._rate_limited_body = json.dumps({'status': {'code': 429, 'message': 'Too many requests'}})
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        draw = self._random.random()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if draw < self.error_rate:
+            return web.Response(status=503, text='Service Unavailable')
+        if draw < self.error_rate + self.rate_limit_rate:
+            return web.Response(status=429, text=self._rate_limited_body, content_type='application/json')
+        return web.Response(text=self._body, content_type='application/json')
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/geocode/v1/json', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port, backlog=1024)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.domain = f"localhost:{port}"
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        """Stop the server and its thread."""
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with MockServer(args.latency, args.error_rate, args.rate_limit_rate, port=args.port) as server:
+        print(f"Serving on http://{server.domain}/geocode/v1/json, Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,223 @@
+"""Benchmark the geocoder against a local mock of the OpenCage API.
+
+Measures throughput and latency percentiles of the different ways of
+calling the API, at several concurrency levels, and optionally peak
+memory. No API key or network access is needed.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --requests 2000 --latency 0.05 --concurrency 1 10 50
+    python benchmarks/run.py --json baseline.json
+    python benchmarks/run.py --compare baseline.json --tolerance 0.2
+
+By default the mock server runs on a thread of the benchmark process. To
+keep it from competing for the GIL, start it separately with
+``python benchmarks/mock_server.py`` and pass ``--domain localhost:PORT``.
+
+Scenarios:
+
+- ``sync``: ``geocode`` calls outside a ``with`` block (shared session)
+- ``session``: ``geocode`` calls inside ``with geocoder:``
+- ``threads``: ``geocode_many`` with ``max_workers`` set to the concurrency
+- ``async``: ``geocode_batch_async`` with the given concurrency
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from mock_server import MockServer
+
+from opencage.geocoder import OpenCageGeocode
+from opencage.version import __version__
+
+SCENARIOS = ('sync', 'session', 'threads', 'async')
+SEQUENTIAL = ('sync', 'session')
+
+
+def _queries(count):
+    return [f"Münster {i}" for i in range(count)]
+
+
+def _run_sync(geocoder, queries, concurrency):
+    errors = 0
+    for query in queries:
+        try:
+            geocoder.geocode(query)
+        except Exception:
+            errors += 1
+    return errors
+
+
+def _run_session(geocoder, queries, concurrency):
+    with geocoder:
+        return _run_sync(geocoder, queries, concurrency)
+
+
+def _run_threads(geocoder, queries, concurrency):
+    results = geocoder.geocode_many(queries, max_workers=concurrency, return_exceptions=True)
+    return sum(isinstance(result, Exception) for result in results)
+
+
+def _run_async(geocoder, queries, concurrency):
+    async def run():
+        async with geocoder:
+            return await geocoder.geocode_batch_async(queries, concurrency=concurrency, return_exceptions=True)
+
+    results = asyncio.run(run())
+    return sum(isinstance(result, Exception) for result in results)
+
+
+RUNNERS = {
+    'sync': _run_sync,
+    'session': _run_session,
+    'threads': _run_threads,
+    'async': _run_async,
+}
+
+
+class _ExternalServer:
+    """A mock server running in another process; its request count is unknown."""
+
+    requests = None
+
+    def __init__(self, domain):
+        self.domain = domain
+
+
+def _percentile(values, percent):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run_scenario(server, scenario, requests, concurrency, memory=False):
+    """Run one scenario and return its measurements as a dict."""
+    latencies = []
+    geocoder = OpenCageGeocode('benchmark', protocol='http', domain=server.domain,
+                               observer=lambda info: latencies.append(info.latency))
+    queries = _queries(requests)
+    sent_before = server.requests
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    errors = RUNNERS[scenario](geocoder, queries, concurrency)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': requests,
+        'sent': server.requests - sent_before if server.requests is not None else None,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput': requests / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p95_ms': _percentile(latencies, 95) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'peak_memory_kb': peak // 1024 if peak is not None else None,
+    }
+
+
+def _print_table(rows):
+    print(f"{'scenario':<10}{'conc':>6}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errors':>8}{'sent':>7}{'peak KB':>9}")
+    for row in rows:
+        peak = row['peak_memory_kb'] if row['peak_memory_kb'] is not None else '-'
+        sent = row['sent'] if row['sent'] is not None else '-'
+        print(f"{row['scenario']:<10}{row['concurrency']:>6}{row['throughput']:>10.1f}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['errors']:>8}{sent:>7}{peak:>9}")
+
+
+def _compare(rows, baseline_path, tolerance):
+    """Print throughput changes against a baseline and return the number of regressions."""
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = {(row['scenario'], row['concurrency']): row for row in json.load(file)['results']}
+
+    regressions = 0
+    for row in rows:
+        before = baseline.get((row['scenario'], row['concurrency']))
+        if before is None:
+            continue
+        change = row['throughput'] / before['throughput'] - 1
+        flag = ''
+        if change < -tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{row['scenario']:<10}{row['concurrency']:>6}{before['throughput']:>10.1f} ->"
+              f"{row['throughput']:>10.1f} req/s ({change:+.0%}){flag}")
+    return regressions
+
+
+def _parse_args(args):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=500, help="requests per run (default: 500)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50],
+                        help="concurrency levels for the threads and async scenarios (default: 1 10 50)")
+    parser.add_argument('--domain', help="use a mock server that is already running, e.g. localhost:8080")
+    parser.add_argument('--latency', type=float, default=0.0, help="server latency in seconds (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of 503 responses, which are retried (default: 0)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="fraction of 429 responses (default: 0)")
+    parser.add_argument('--results', type=int, default=1, help="results per response (default: 1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true',
+                        help="measure peak memory with tracemalloc, which slows the runs down")
+    parser.add_argument('--json', metavar='FILE', help="write the measurements to a JSON file")
+    parser.add_argument('--compare', metavar='FILE', help="compare throughput with an earlier --json file")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="throughput drop counted as a regression with --compare (default: 0.1)")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    options = _parse_args(sys.argv[1:] if args is None else args)
+
+    if options.domain:
+        server = contextlib.nullcontext(_ExternalServer(options.domain))
+    else:
+        server = MockServer(latency=options.latency, error_rate=options.error_rate,
+                            rate_limit_rate=options.rate_limit_rate, results=options.results, seed=options.seed)
+
+    rows = []
+    with server as server:
+        for scenario in options.scenarios:
+            levels = [1] if scenario in SEQUENTIAL else options.concurrency
+            for concurrency in levels:
+                rows.append(run_scenario(server, scenario, options.requests, concurrency, memory=options.memory))
+
+    _print_table(rows)
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as file:
+            json.dump({
+                'version': __version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'options': vars(options),
+                'results': rows,
+            }, file, indent=2)
+
+    if options.compare:
+        print()
+        if _compare(rows, options.compare, options.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
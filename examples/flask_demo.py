@@ -8,7 +8,10 @@ from opencage.geocoder import OpenCageGeocode
 
 app = Flask(__name__)
 _key = OPEN_CAGE_KEY = "YOUR_OPEN_CAGE_KEY"
-_geocoder = OpenCageGeocode(OPEN_CAGE_KEY)
+# One client for all request threads. With thread_safe=True it owns a pool of
+# keep-alive connections that the threads share, so requests don't each pay
+# for a new TLS handshake. Size the pool to the number of worker threads.
+_geocoder = OpenCageGeocode(OPEN_CAGE_KEY, thread_safe=True, pool_size=16)
 
 @app.route("/forward/<address>")
 def forward(address):
@@ -24,4 +27,4 @@ def reverse(lat, lng):
     return json.dumps(raw_result if verbose else [r["components"] for r in raw_result])
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,503 @@
+"""Streaming batch geocoding of CSV and JSONL input.
+
+Rows are read lazily, geocoded concurrently over one async session and
+written out in input order as soon as they are done, so memory use stays
+bounded no matter how large the input is.
+
+A ``Checkpoint`` journal lets a run that was killed pick up where it
+stopped without requesting rows again that already succeeded.
+
+Run as ``python -m opencage.batch``; see ``--help`` for the options. For
+a full-featured command-line tool see the separate ``opencage-cli``
+package.
+"""
+
+import argparse
+import asyncio
+import collections
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+from .concurrency import AdaptiveConcurrency
+from .geocoder import (
+    DEFAULT_CONCURRENCY,
+    CircuitOpenError,
+    InvalidInputError,
+    OpenCageGeocode,
+    RateLimitExceededError,
+    UnknownError,
+    _check_concurrency,
+    _max_limit,
+)
+
+DEFAULT_OUTPUT_COLUMNS = ['lat', 'lng', 'formatted']
+
+# shortest wait between tries of a row held back by an open circuit breaker
+CIRCUIT_WAIT = 0.1
+# longest wait for too many requests per second to be allowed again, beyond which the run stops
+RATE_LIMIT_WAIT = 60
+
+
+def read_rows(file, input_format='csv'):
+    """Lazily read input rows from a file.
+
+    Args:
+        file: Text file object to read from.
+        input_format: 'csv' or 'jsonl'.
+
+    Yields:
+        Lists of strings for CSV input; decoded JSON values for JSONL input.
+        Empty JSONL lines are skipped.
+    """
+    if input_format == 'csv':
+        yield from csv.reader(file)
+    elif input_format == 'jsonl':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown input format {input_format!r}")
+
+
+def row_query(row, reverse=False, input_columns=None):
+    """Extract the query from an input row.
+
+    CSV rows (lists) use the 1-based ``input_columns``: by default the
+    first column as address, or the first two as latitude and longitude
+    for reverse geocoding. Several address columns are joined with ', '.
+    JSONL rows may also be a plain string (the address) or an object with
+    a ``query`` key, or ``lat`` and ``lng`` keys.
+
+    Args:
+        row: Input row as returned by ``read_rows``.
+        reverse: Whether the row holds coordinates rather than an address.
+        input_columns: Optional list of 1-based column numbers.
+
+    Returns:
+        Address string, or ``(lat, lng)`` tuple if reverse is True.
+
+    Raises:
+        InvalidInputError: If the row doesn't contain the expected fields.
+    """
+    try:
+        if isinstance(row, dict):
+            if reverse:
+                return row['lat'], row['lng']
+            return row['query']
+
+        if isinstance(row, str) and not reverse:
+            return row
+
+        if isinstance(row, list):
+            columns = input_columns or ([1, 2] if reverse else [1])
+            values = [row[column - 1] for column in columns]
+            if reverse:
+                lat, lng = values
+                return lat, lng
+            return ', '.join(value.strip() for value in values if value.strip())
+    except (KeyError, IndexError, ValueError, TypeError, AttributeError):
+        pass
+
+    raise InvalidInputError("Input row doesn't contain a query: " + repr(row)[:100], bad_value=row)
+
+
+async def geocode_rows(geocoder, rows, reverse=False, input_columns=None,
+                       concurrency=DEFAULT_CONCURRENCY, completed=None, on_complete=None, **kwargs):
+    """Geocode input rows concurrently, yielding results in input order.
+
+    At most ``concurrency`` requests are in flight. Rows are read from
+    ``rows`` only as far as needed to keep them busy, with a read-ahead
+    of a few times ``concurrency`` rows while waiting for a slow one.
+    With an ``AdaptiveConcurrency`` the limit follows how the API copes,
+    and the read-ahead is based on its ``max_limit``.
+
+    Rows with bad input or that fail with an ``UnknownError`` after all
+    retries yield the exception as result. When the API answers with too
+    many requests per second, or the geocoder's circuit breaker is open,
+    no new requests are sent for a while and the row is tried again.
+    Other errors, such as a bad API key or an exhausted quota, stop the run.
+
+    Args:
+        geocoder: ``OpenCageGeocode`` inside an ``async with`` block.
+        rows: Iterable of input rows.
+        reverse: Whether to reverse geocode coordinates.
+        input_columns: Optional list of 1-based column numbers, see ``row_query``.
+        concurrency: Maximum number of requests in flight at once, or an
+            ``AdaptiveConcurrency``.
+        completed: Optional dict mapping 0-based row numbers to results
+            that are already known; these rows aren't requested again.
+        on_complete: Optional callable ``on_complete(row_number, results)``,
+            called for each successful request as soon as it finishes.
+        **kwargs: Additional API parameters.
+
+    Yields:
+        ``(row, results)`` tuples, results being a list or an exception.
+    """
+    _check_concurrency(concurrency, 'concurrency')
+
+    window_size = _max_limit(concurrency) * 4
+    completed = completed or {}
+    # rows read and not yielded yet that need a request, and the rows to try again
+    requested = set()
+    retries = collections.deque()
+    # results waiting for the rows before them
+    done = {}
+    next_number = 0
+    resume_at = 0
+    changed = asyncio.Event()
+
+    async def pending_rows():
+        numbered = enumerate(rows)
+        exhausted = False
+        while True:
+            delay = resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif retries:
+                yield retries.popleft()
+            elif not exhausted and len(requested) < window_size:
+                item = next(numbered, None)
+                if item is None:
+                    exhausted = True
+                elif item[0] in completed:
+                    done[item[0]] = (item[1], completed.pop(item[0]))
+                else:
+                    requested.add(item[0])
+                    yield item
+            elif exhausted and not requested:
+                return
+            else:
+                changed.clear()
+                await changed.wait()
+
+    async def geocode_row(item):
+        query = row_query(item[1], reverse=reverse, input_columns=input_columns)
+        if reverse:
+            return await geocoder.reverse_geocode_async(*query, **kwargs)
+        return await geocoder.geocode_async(query, **kwargs)
+
+    def in_order():
+        nonlocal next_number
+        while next_number in done:
+            requested.discard(next_number)
+            yield done.pop(next_number)
+            next_number += 1
+
+    stream = geocoder._run_async(pending_rows(), concurrency, geocode_row)
+    try:
+        async for (number, row), results in stream:
+            wait = _retry_wait(results)
+            if wait is not None:
+                resume_at = max(resume_at, time.monotonic() + wait)
+                retries.append((number, row))
+            elif isinstance(results, Exception) and not isinstance(results, (InvalidInputError, UnknownError)):
+                raise results
+            else:
+                if on_complete is not None and not isinstance(results, Exception):
+                    on_complete(number, results)
+                done[number] = (row, results)
+                for item in in_order():
+                    yield item
+            changed.set()
+        for item in in_order():
+            yield item
+    finally:
+        await stream.aclose()
+
+
+def _retry_wait(exc):
+    """Seconds to wait before trying a row again that failed with ``exc``, or None to give up."""
+    if isinstance(exc, CircuitOpenError):
+        return max(exc.retry_after or 0, CIRCUIT_WAIT)
+    if isinstance(exc, RateLimitExceededError) and exc.status == 429 and exc.reset is not None:
+        wait = exc.reset - time.time()
+        if wait <= RATE_LIMIT_WAIT:
+            return max(wait, 0)
+    return None
+
+
+def result_values(results, columns):
+    """Pick output values from the first result.
+
+    Args:
+        results: List of results for one row, or an exception.
+        columns: Column names; 'lat' and 'lng' come from the geometry,
+            other names from the top level of the result or its components.
+
+    Returns:
+        List of values, empty strings where nothing was found.
+    """
+    if isinstance(results, Exception) or not results:
+        return [''] * len(columns)
+
+    result = results[0]
+    values = []
+    for column in columns:
+        if column in ('lat', 'lng'):
+            value = result.get('geometry', {}).get(column, '')
+        elif column in result:
+            value = result[column]
+        else:
+            value = result.get('components', {}).get(column, '')
+        values.append(value)
+    return values
+
+
+class CsvWriter:
+    """Write geocoded rows as CSV, appending result columns to each row."""
+
+    def __init__(self, file, columns=None):
+        self.columns = columns or DEFAULT_OUTPUT_COLUMNS
+        self._writer = csv.writer(file)
+
+    def write_header(self, header):
+        self._writer.writerow(list(header) + self.columns)
+
+    def write(self, row, results):
+        if not isinstance(row, list):
+            row = [row if isinstance(row, str) else json.dumps(row)]
+        self._writer.writerow(row + result_values(results, self.columns))
+
+
+class JsonlWriter:
+    """Write geocoded rows as JSON lines with the input and the results or error."""
+
+    def __init__(self, file):
+        self._file = file
+
+    def write_header(self, header):
+        pass
+
+    def write(self, row, results):
+        record = {'input': row}
+        if isinstance(results, Exception):
+            record['error'] = str(results)
+        else:
+            record['results'] = results
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class Checkpoint:
+    """Journal of a batch run, so that it can be resumed after being killed.
+
+    The journal is a JSON lines file. As each request succeeds, its row
+    number and results are appended, so finished work isn't lost even if
+    the output hasn't been written yet. Every ``interval`` output rows a
+    marker records how many rows and bytes of output are complete.
+
+    When a run is started again with the same journal, the output is cut
+    back to the last marker, rows up to it are skipped and journaled
+    results after it are used instead of new requests.
+
+    Args:
+        path: Path of the journal file; created if it doesn't exist.
+        interval: Number of output rows between markers.
+    """
+
+    def __init__(self, path, interval=100):
+        self.path = path
+        self.interval = interval
+        self.rows = 0
+        self.offset = 0
+        self.completed = {}
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        # end of the last intact line; anything after it is cut off so new
+        # entries don't get glued onto a line torn when a run was killed
+        intact = 0
+        position = 0
+        with open(self.path, 'rb') as file:
+            for line in file:
+                position += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                    if 'rows' in entry:
+                        rows, offset = int(entry['rows']), int(entry['offset'])
+                    else:
+                        row, results = int(entry['row']), entry['results']
+                except (ValueError, TypeError, KeyError):
+                    # damaged line, e.g. one a run glued onto a torn line
+                    continue
+                intact = position
+                if 'rows' in entry:
+                    self.rows = rows
+                    self.offset = offset
+                    self.completed = {n: r for n, r in self.completed.items() if n >= self.rows}
+                else:
+                    self.completed[row] = results
+
+        if intact < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as file:
+                file.truncate(intact)
+
+    def record(self, row_number, results):
+        """Journal the results of a successful request."""
+        self._file.write(json.dumps({'row': row_number, 'results': results}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def commit(self, rows, offset):
+        """Journal that ``rows`` rows, ``offset`` bytes, of output are complete."""
+        self.rows = rows
+        self.offset = offset
+        self._file.write(json.dumps({'rows': rows, 'offset': offset}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
+
+
+async def run(geocoder, infile, outfile, input_format='csv', output_format=None, headers=False,
+              reverse=False, input_columns=None, output_columns=None,
+              concurrency=DEFAULT_CONCURRENCY, checkpoint=None, **kwargs):
+    """Geocode every row of ``infile`` and stream the results to ``outfile``.
+
+    Args:
+        geocoder: ``OpenCageGeocode`` instance; an async session is opened
+            on it for the duration of the run.
+        infile: Text file object to read from.
+        outfile: Text file object to write to.
+        input_format: 'csv' or 'jsonl'.
+        output_format: 'csv' or 'jsonl', by default the input format.
+        headers: Whether the first CSV row is a header row to pass through.
+        reverse: Whether to reverse geocode coordinates.
+        input_columns: Optional list of 1-based column numbers, see ``row_query``.
+        output_columns: Result columns to add to CSV output.
+        concurrency: Maximum number of requests in flight at once, or an
+            ``AdaptiveConcurrency``.
+        checkpoint: Optional ``Checkpoint`` to journal progress to and
+            resume from. ``outfile`` must then be a seekable file opened
+            for appending.
+        **kwargs: Additional API parameters.
+
+    Returns:
+        Number of rows written by this run.
+    """
+    output_format = output_format or input_format
+    if output_format == 'csv':
+        writer = CsvWriter(outfile, output_columns)
+    elif output_format == 'jsonl':
+        writer = JsonlWriter(outfile)
+    else:
+        raise ValueError(f"Unknown output format {output_format!r}")
+
+    rows = read_rows(infile, input_format)
+    header = next(rows, []) if headers and input_format == 'csv' else None
+
+    skip = 0
+    completed = None
+    on_complete = None
+    if checkpoint is not None:
+        skip = checkpoint.rows
+        completed = {number - skip: results for number, results in checkpoint.completed.items()}
+
+        def record_result(number, results):
+            checkpoint.record(number + skip, results)
+
+        on_complete = record_result
+
+        outfile.seek(checkpoint.offset)
+        outfile.truncate()
+        rows = itertools.islice(rows, skip, None)
+
+    if header is not None and (checkpoint is None or checkpoint.offset == 0):
+        writer.write_header(header)
+        if checkpoint is not None:
+            outfile.flush()
+            checkpoint.commit(0, outfile.tell())
+
+    count = 0
+    async with geocoder:
+        async for row, results in geocode_rows(geocoder, rows, reverse=reverse, input_columns=input_columns,
+                                               concurrency=concurrency, completed=completed,
+                                               on_complete=on_complete, **kwargs):
+            writer.write(row, results)
+            count += 1
+            if checkpoint is not None and count % checkpoint.interval == 0:
+                outfile.flush()
+                checkpoint.commit(skip + count, outfile.tell())
+
+    if checkpoint is not None:
+        outfile.flush()
+        checkpoint.commit(skip + count, outfile.tell())
+    return count
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m opencage.batch',
+        description="Geocode addresses or coordinates from a CSV or JSONL file.")
+    parser.add_argument('--api-key', help="OpenCage API key, by default from OPENCAGE_API_KEY")
+    parser.add_argument('--input', default='-', help="Input file, '-' for stdin (default)")
+    parser.add_argument('--output', default='-', help="Output file, '-' for stdout (default)")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], help="By default the input format")
+    parser.add_argument('--headers', action='store_true', help="CSV input has a header row")
+    parser.add_argument('--reverse', action='store_true', help="Input holds latitude and longitude")
+    parser.add_argument('--input-columns', help="Comma-separated 1-based input column numbers")
+    parser.add_argument('--add-columns', default=','.join(DEFAULT_OUTPUT_COLUMNS),
+                        help="Comma-separated result columns to add to CSV output")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of requests in flight")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Adjust the number of requests in flight, up to --concurrency, to how the API copes")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help="Additional API parameter, may be repeated")
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help="Journal file to resume an interrupted run from; requires --output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    args = _parse_args(argv)
+    params = dict(param.split('=', 1) for param in args.param)
+    input_columns = [int(x) for x in args.input_columns.split(',')] if args.input_columns else None
+
+    if args.checkpoint and args.output == '-':
+        raise SystemExit("--checkpoint requires --output")
+
+    geocoder = OpenCageGeocode(args.api_key)
+    concurrency = args.concurrency
+    if args.adaptive:
+        concurrency = AdaptiveConcurrency(initial=min(4, concurrency), max_limit=concurrency)
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+
+    infile = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    if args.output == '-':
+        outfile = sys.stdout
+    else:
+        # keep the existing output when resuming, `run` cuts it back to the last checkpoint
+        outfile = open(args.output, 'a' if checkpoint else 'w', newline='', encoding='utf-8')
+    try:
+        asyncio.run(run(
+            geocoder, infile, outfile,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            headers=args.headers,
+            reverse=args.reverse,
+            input_columns=input_columns,
+            output_columns=args.add_columns.split(','),
+            concurrency=concurrency,
+            checkpoint=checkpoint,
+            **params))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+if __name__ == '__main__':
+    main()
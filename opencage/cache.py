@@ -0,0 +1,404 @@
+"""Response caches for the OpenCage geocoder."""
+
+from collections import OrderedDict
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def cache_key(params):
+    """Build a canonical cache key from request parameters.
+
+    The API key is left out, so the same query sent with different keys
+    shares one cache entry.
+
+    Args:
+        params: Dict of request parameters as built by ``_parse_request``.
+
+    Returns:
+        String with the parameters sorted and URL-encoded.
+    """
+    return urlencode(sorted((name, str(value)) for name, value in params.items() if name != 'key'))
+
+
+class BaseCache:
+    """Interface for response cache backends.
+
+    A backend maps the keys built by ``cache_key`` to parsed API response
+    dicts. Subclasses must implement ``get`` and ``set``; they may be
+    called from several threads at once.
+    """
+
+    def get(self, key):
+        """Return the cached response for ``key``, or None on a miss."""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Store the response ``value`` under ``key``."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """In-process cache with least-recently-used eviction and expiry.
+
+    Responses are stored as-is and handed out again on a hit, so
+    callers of ``raw_response=True`` should treat them as read-only.
+
+    Args:
+        maxsize: Maximum number of entries kept.
+        ttl: Seconds an entry stays valid, or None to keep entries until
+            they are evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=24 * 60 * 60):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(BaseCache):
+    """On-disk cache in an SQLite database, shared between processes.
+
+    The database runs in WAL mode so several worker processes can read
+    and write the same file at once. Keys are stored as SHA-256 hashes.
+    Expired entries and, once the database holds more than ``maxsize``
+    entries, the least recently used ones are pruned every
+    ``prune_interval`` writes, so the size cap is approximate.
+
+    Hits don't write to the database each time: the access times used
+    for eviction are saved in batches of ``touch_interval``, and before
+    pruning, so a cache hit rarely takes the write lock.
+
+    A connection is never used across ``fork()``, which SQLite warns can
+    corrupt the database: a cache created in a parent process (e.g.
+    with gunicorn's ``--preload``) opens a new connection in each child.
+
+    Args:
+        path: Path of the database file; created if it doesn't exist.
+        maxsize: Maximum number of entries kept, or None for no cap.
+        ttl: Seconds an entry stays valid, or None to keep entries until
+            they are evicted.
+        prune_interval: Number of writes between pruning passes.
+        timeout: Seconds to wait for another process's write lock.
+        touch_interval: Number of hits whose access times are saved together.
+    """
+
+    def __init__(self, path, maxsize=1_000_000, ttl=30 * 24 * 60 * 60, prune_interval=100, timeout=30,
+                 touch_interval=100):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self._writes = 0
+        self._touched = {}
+        self._hits = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    def _connection(self):
+        """Return the connection of this process, opening it if needed. Call with the lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            # a connection inherited from the parent is dropped, not closed
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+            self._touched = {}
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        hashed = self._hash(key)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, expires FROM responses WHERE key = ?', (hashed,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires = row
+            if expires is not None and expires <= now:
+                conn.execute('DELETE FROM responses WHERE key = ?', (hashed,))
+                return None
+
+            self._touched[hashed] = now
+            self._hits += 1
+            if self._hits >= self.touch_interval:
+                self._save_touched(conn)
+        return json.loads(value)
+
+    def _save_touched(self, conn):
+        """Write the access times of recent hits in one transaction."""
+        self._hits = 0
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('UPDATE responses SET accessed = ? WHERE key = ?',
+                             [(accessed, key) for key, accessed in touched.items()])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def set(self, key, value):
+        now = time.time()
+        expires = None if self.ttl is None else now + self.ttl
+        hashed = self._hash(key)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (hashed, json.dumps(value), expires, now)
+            )
+            self._touched.pop(hashed, None)
+            self._writes += 1
+            if self._writes >= self.prune_interval:
+                self._writes = 0
+                self._prune(conn, now)
+
+    def prune(self):
+        """Remove expired entries and evict down to ``maxsize``."""
+        with self._lock:
+            self._prune(self._connection(), time.time())
+
+    def _prune(self, conn, now):
+        self._save_touched(conn)
+        conn.execute('DELETE FROM responses WHERE expires IS NOT NULL AND expires <= ?', (now,))
+        if self.maxsize is not None:
+            conn.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.maxsize,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+            self._connection().execute('DELETE FROM responses')
+
+    def close(self):
+        """Save pending access times and close the database connection."""
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                return
+            self._save_touched(self._conn)
+            self._conn.close()
+            self._conn = None
+
+
+def _distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in metres (haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class ReverseGeocodeCache:
+    """In-process cache for reverse geocoding keyed on a coordinate grid.
+
+    Coordinates are snapped to a grid of ``precision`` decimal places
+    (4 places is roughly 11 metres), so points that are close together
+    share a cached result even if their exact coordinates differ.
+
+    If ``tolerance`` is set, a lookup instead returns the result of the
+    nearest cached point at most ``tolerance`` metres away. Points are
+    then indexed on a coarser grid with cells at least ``tolerance``
+    wide, so a lookup checks at most 3x3 cells whatever the tolerance.
+
+    Args:
+        precision: Number of decimal places of the grid, used without ``tolerance``.
+        tolerance: Maximum distance in metres to reuse a cached point, or
+            None to reuse any point in the same grid cell.
+        maxsize: Maximum number of points kept, least recently used are
+            evicted first.
+        ttl: Seconds an entry stays valid, or None to keep entries until
+            they are evicted.
+    """
+
+    def __init__(self, precision=4, tolerance=None, maxsize=100_000, ttl=24 * 60 * 60):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.precision = precision
+        self.tolerance = tolerance
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._scale = 10 ** precision
+        if tolerance is not None:
+            # degrees of latitude covered by one row of the coarse grid
+            self._row_deg = max(math.degrees(tolerance / EARTH_RADIUS_M), 1e-9)
+        self._entries = OrderedDict()
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cell(self, lat, lng):
+        if self.tolerance is None:
+            return round(lat * self._scale), round(lng * self._scale)
+        row = math.floor(lat / self._row_deg)
+        return row, self._column(row, lng)
+
+    def _columns(self, row):
+        """Number of columns of a row of the coarse grid.
+
+        Columns are at least ``tolerance`` wide at the latitude two rows
+        further towards the pole, so any point within ``tolerance`` of a
+        point in this or a neighbouring row is at most one column away;
+        that's as far as the shortest path between them can go.
+        """
+        edge = (max(abs(row), abs(row + 1)) + 2) * self._row_deg
+        if edge >= 90:
+            return 1
+        width = self._row_deg / math.cos(math.radians(edge))
+        return max(1, math.floor(360 / width))
+
+    def _column(self, row, lng):
+        columns = self._columns(row)
+        return math.floor((lng + 180) / 360 * columns) % columns
+
+    def get(self, lat, lng, params_key=''):
+        """Return a cached response for a point near ``lat``, ``lng``.
+
+        Args:
+            lat: Latitude.
+            lng: Longitude.
+            params_key: Key of the other request parameters, e.g. from
+                ``cache_key``; only entries with the same key match.
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        lat, lng = float(lat), float(lng)
+        now = time.monotonic()
+
+        if self.tolerance is None:
+            cells = [self._cell(lat, lng)]
+        else:
+            row = math.floor(lat / self._row_deg)
+            cells = set()
+            for cell_row in (row - 1, row, row + 1):
+                col = self._column(cell_row, lng)
+                columns = self._columns(cell_row)
+                cells.update((cell_row, (col + offset) % columns) for offset in (-1, 0, 1))
+
+        with self._lock:
+            best_key = None
+            best_distance = math.inf
+            for cell_row, cell_col in cells:
+                for key in self._cells.get((params_key, cell_row, cell_col), ()):
+                    expires = self._entries[key][0]
+                    if expires is not None and expires <= now:
+                        continue
+                    if self.tolerance is None:
+                        distance = 0
+                    else:
+                        distance = _distance_m(lat, lng, key[1], key[2])
+                        if distance > self.tolerance:
+                            continue
+                    if distance < best_distance:
+                        best_key, best_distance = key, distance
+
+            if best_key is None:
+                return None
+
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][1]
+
+    def set(self, lat, lng, value, params_key=''):
+        """Store the response ``value`` for the point ``lat``, ``lng``.
+
+        Args:
+            lat: Latitude.
+            lng: Longitude.
+            value: Parsed API response dict.
+            params_key: Key of the other request parameters.
+        """
+        lat, lng = float(lat), float(lng)
+        key = (params_key, lat, lng)
+        cell = (params_key,) + self._cell(lat, lng)
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (expires, value, cell)
+            self._entries.move_to_end(key)
+            self._cells.setdefault(cell, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (_, _, old_cell) = self._entries.popitem(last=False)
+                keys = self._cells[old_cell]
+                keys.discard(old_key)
+                if not keys:
+                    del self._cells[old_cell]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._cells.clear()
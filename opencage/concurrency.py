@@ -0,0 +1,81 @@
+"""Adaptive concurrency limit for batch geocoding."""
+
+import math
+import threading
+
+
+class AdaptiveConcurrency:
+    """Finds the number of requests to keep in flight by itself (AIMD).
+
+    Pass one as ``concurrency`` to ``geocode_batch_async`` or
+    ``geocode_stream_async``, or as ``max_workers`` to ``geocode_many``,
+    instead of a fixed number.
+
+    The limit grows by about one for every ``limit`` requests that
+    complete without trouble (additive increase). It is cut by
+    ``backoff_ratio`` when a request fails because the API is overloaded
+    (rate limited, server errors, timeouts) or takes more than
+    ``latency_tolerance`` times the usual latency (multiplicative
+    decrease). It is cut at most once per ``limit`` completed requests,
+    since the requests in flight together all see the same trouble.
+
+    The usual latency is the lowest seen, drifting slowly up to the
+    current latency so a lasting change in the API's speed is accepted.
+
+    Args:
+        initial: Limit to start with.
+        min_limit: Lowest limit.
+        max_limit: Highest limit, and the size of the worker or
+            connection pools.
+        backoff_ratio: Factor the limit is multiplied by when cutting back.
+        latency_tolerance: How many times the usual latency a request
+            may take before the limit is cut.
+    """
+
+    # how fast the usual latency follows slower responses
+    BASELINE_DRIFT = 0.01
+
+    def __init__(self, initial=4, min_limit=1, max_limit=100, backoff_ratio=0.5, latency_tolerance=2.0):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial <= max_limit")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(initial)
+        self._baseline = None
+        self._since_decrease = math.inf
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """Number of requests that may be in flight now."""
+        return int(self._limit)
+
+    def record(self, latency, overloaded=False):
+        """Adjust the limit after a request completed.
+
+        Args:
+            latency: Seconds the request took.
+            overloaded: True if it failed because the API is overloaded.
+        """
+        with self._lock:
+            self._since_decrease += 1
+            slow = self._baseline is not None and latency > self._baseline * self.latency_tolerance
+            if overloaded or slow:
+                if self._since_decrease >= self._limit:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+                    self._since_decrease = 0
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            if not overloaded:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    self._baseline += self.BASELINE_DRIFT * (latency - self._baseline)
+
+    def __repr__(self):
+        return f"AdaptiveConcurrency(limit={self.limit}, min_limit={self.min_limit}, max_limit={self.max_limit})"
@@ -0,0 +1,61 @@
+"""JSON decoding of API responses.
+
+Responses are decoded straight from the body bytes with the fastest
+installed backend: ``msgspec``, then ``orjson``, falling back to the
+standard library ``json`` module. All backends produce the same plain
+dicts and lists, and raise ``ValueError`` on invalid JSON.
+"""
+
+import importlib
+import json
+
+JSON_DECODERS = ('msgspec', 'orjson', 'json')
+
+
+def _msgspec_decoder(msgspec):
+    decode = msgspec.json.Decoder().decode
+
+    def loads(body):
+        try:
+            return decode(body)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    return loads
+
+
+def get_decoder(name=None):
+    """Return a function decoding JSON bytes or strings.
+
+    Args:
+        name: One of 'msgspec', 'orjson' or 'json', or None to pick the
+            fastest one installed.
+
+    Returns:
+        A function taking the response body and returning the decoded value.
+
+    Raises:
+        ValueError: If the name is not a known decoder.
+        ImportError: If the named decoder's package is not installed.
+    """
+    if name is None:
+        for candidate in JSON_DECODERS[:-1]:
+            try:
+                return get_decoder(candidate)
+            except ImportError:
+                pass
+        return json.loads
+
+    if name not in JSON_DECODERS:
+        raise ValueError(f"Unknown JSON decoder {name!r}, expected one of {', '.join(JSON_DECODERS)}")
+    if name == 'json':
+        return json.loads
+
+    try:
+        module = importlib.import_module(name)
+    except ImportError as exc:
+        raise ImportError(f"You must install `{name}` to use it as JSON decoder") from exc
+    if name == 'msgspec':
+        return _msgspec_decoder(module)
+    # orjson.JSONDecodeError is a subclass of ValueError
+    return module.loads
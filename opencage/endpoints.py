@@ -0,0 +1,157 @@
+"""Spreading requests over several API keys and domains, with failover."""
+
+import random
+import threading
+import time
+
+
+class EndpointPool:
+    """Chooses the API key and URL for each request and tracks their health.
+
+    Keys are used in turn. A key that has used up its quota is left out
+    until the quota resets, as reported by the API, or else for
+    ``cooldown`` seconds. A key the API rejects is left out for
+    ``rejected_cooldown`` seconds.
+
+    URLs are picked at random, weighted by the inverse of their recent
+    average latency, so faster ones get more of the requests. A URL that
+    fails ``max_failures`` times in a row is left out for ``cooldown``
+    seconds. If all URLs are left out, the one due back first is used.
+
+    ``OpenCageGeocode`` creates a pool when it is given several keys or
+    domains. The pool is thread-safe and can be shared between instances.
+
+    Args:
+        keys: List of API keys.
+        urls: List of API URLs.
+        cooldown: Seconds a key out of quota, or a failing URL, is left out.
+        rejected_cooldown: Seconds a rejected key is left out.
+        max_failures: Number of consecutive errors after which a URL is left out.
+    """
+
+    # weight of the newest latency in the moving average
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(self, keys, urls, cooldown=60, rejected_cooldown=3600, max_failures=3):
+        if not keys or not urls:
+            raise ValueError("At least one key and one URL are required")
+        self.keys = list(keys)
+        self.urls = list(urls)
+        self.cooldown = cooldown
+        self.rejected_cooldown = rejected_cooldown
+        self.max_failures = max_failures
+        self._key_until = dict.fromkeys(self.keys, 0)
+        self._key_rejected = dict.fromkeys(self.keys, False)
+        self._key_status = dict.fromkeys(self.keys)
+        self._next_key = 0
+        self._url_until = dict.fromkeys(self.urls, 0)
+        self._url_failures = dict.fromkeys(self.urls, 0)
+        self._url_latency = dict.fromkeys(self.urls)
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Pick the key and URL for the next request.
+
+        Returns:
+            ``(key, url)``, or None if no key can be used right now.
+        """
+        now = time.time()
+        with self._lock:
+            for offset in range(len(self.keys)):
+                index = (self._next_key + offset) % len(self.keys)
+                if self._key_until[self.keys[index]] <= now:
+                    key = self.keys[index]
+                    self._next_key = index + 1
+                    break
+            else:
+                return None
+
+            urls = [url for url in self.urls if self._url_until[url] <= now]
+            if not urls:
+                return key, min(self.urls, key=self._url_until.get)
+            return key, random.choices(urls, weights=self._weights(urls))[0]
+
+    def _weights(self, urls):
+        known = [self._url_latency[url] for url in urls if self._url_latency[url] is not None]
+        # URLs without measurements yet count as fast as the fastest, so they get tried
+        fastest = max(min(known), 0.001) if known else 1.0
+        return [1 / max(self._url_latency[url] or fastest, 0.001) for url in urls]
+
+    def succeeded(self, key, url, latency, response_json=None):
+        """Record a successful request.
+
+        Args:
+            key: Key used.
+            url: URL used.
+            latency: Seconds the request took.
+            response_json: Parsed response. If its ``rate`` block shows the
+                quota used up, the key is left out until it resets.
+        """
+        with self._lock:
+            average = self._url_latency[url]
+            if average is None:
+                self._url_latency[url] = latency
+            else:
+                self._url_latency[url] = average + self.LATENCY_SMOOTHING * (latency - average)
+            self._url_failures[url] = 0
+            self._key_rejected[key] = False
+
+            rate = response_json.get('rate') if isinstance(response_json, dict) else None
+            if isinstance(rate, dict) and rate.get('remaining') == 0 and rate.get('reset'):
+                self._key_until[key] = rate['reset']
+                self._key_status[key] = 402
+
+    def url_failed(self, url):
+        """Record a request that failed because of a server or connection error."""
+        with self._lock:
+            self._url_failures[url] += 1
+            if self._url_failures[url] >= self.max_failures:
+                self._url_until[url] = time.time() + self.cooldown
+                self._url_failures[url] = 0
+
+    def key_failed(self, key, reset=None, rejected=False, status=None):
+        """Record a request refused because of its key.
+
+        Args:
+            key: Key used.
+            reset: Unix time the key's quota resets, if known.
+            rejected: True if the key was rejected rather than out of quota.
+            status: HTTP status of the refusal, 402 for a used up quota or
+                429 for too many requests per second, if known.
+
+        Returns:
+            Whether another key can be used right now.
+        """
+        now = time.time()
+        with self._lock:
+            if rejected:
+                self._key_until[key] = now + self.rejected_cooldown
+            elif reset is not None and reset > now:
+                self._key_until[key] = reset
+            else:
+                self._key_until[key] = now + self.cooldown
+            self._key_rejected[key] = rejected
+            self._key_status[key] = None if rejected else status
+            return any(until <= now for until in self._key_until.values())
+
+    def all_keys_rejected(self):
+        """Whether every key is left out because the API rejected it."""
+        with self._lock:
+            return all(self._key_rejected.values())
+
+    def quota_reset(self):
+        """Unix time the first key left out for its quota can be used again, or None."""
+        return self._first_back()[0]
+
+    def quota_status(self):
+        """HTTP status that left out the key due back first: 402, 429, or None if unknown."""
+        return self._first_back()[1]
+
+    def _first_back(self):
+        """``(until, status)`` of the key left out for its quota that is due back first."""
+        with self._lock:
+            keys = [key for key in self.keys if not self._key_rejected[key]]
+            if not keys:
+                return None, None
+            key = min(keys, key=self._key_until.get)
+            return self._key_until[key], self._key_status[key]
@@ -1,22 +1,58 @@
 """Geocoder module for the OpenCage API."""
 
 from decimal import Decimal
+import asyncio
 import collections
-
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextlib
+from email.utils import parsedate_to_datetime
+import functools
+import http.cookiejar
+import importlib.util
+import itertools
+import logging
 import os
+import random
 import sys
+import threading
+import time
 from urllib.parse import urlsplit
 import requests
 import backoff
 from .version import __version__
-
-try:
-    import aiohttp
-    AIOHTTP_AVAILABLE = True
-except ImportError:
-    AIOHTTP_AVAILABLE = False
+from .cache import MemoryCache, ReverseGeocodeCache, cache_key
+from .concurrency import AdaptiveConcurrency
+from .decoder import get_decoder
+from .endpoints import EndpointPool
+from .hedging import HedgePolicy
+from .instrumentation import RequestInfo
+from .ratelimit import RateLimiter
+from .resilience import CircuitBreaker, RetryBudget
+from .results import RESULT_TYPES, results_from_response
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+# aiohttp is only imported once the async methods are used, see _import_aiohttp
+AIOHTTP_AVAILABLE = importlib.util.find_spec('aiohttp') is not None
+aiohttp = None
+
+PYTHON_VERSION = '.'.join(str(x) for x in sys.version_info[0:3])
+
+# requests (urllib3) and aiohttp can both decode brotli if one of these packages is installed
+if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+else:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_DOMAIN = 'api.opencagedata.com'
+DEFAULT_CONCURRENCY = 10
+DEFAULT_POOL_SIZE = 10
+
+# requests sessions shared by all instances for calls outside a `with` block, by number of hosts
+_shared_sessions = {}
+_shared_session_pid = None
+_shared_session_lock = threading.Lock()
 
 
 def _validate_domain(domain):
@@ -76,6 +112,65 @@ def backoff_max_time():
     return int(os.environ.get('BACKOFF_MAX_TIME', '120'))
 
 
+def retry_wait_gen():
+    """Wait generator for retrying API requests, for use with ``backoff``.
+
+    Waits for exponentially growing intervals with full jitter (a random
+    time between 0 and 1, 2, 4, ... seconds). If the failed response
+    carried a ``Retry-After`` header, that time is used instead.
+
+    Yields:
+        Seconds to wait before the next try.
+    """
+    exc = yield
+    n = 0
+    while True:
+        retry_after = getattr(exc, 'retry_after', None)
+        if retry_after is not None:
+            exc = yield retry_after
+        else:
+            exc = yield random.uniform(0, 2 ** n)
+        n += 1
+
+
+def _no_retry(exc):
+    """Tell ``backoff`` to give up on an exception marked as not to be retried."""
+    return getattr(exc, 'no_retry', False)
+
+
+def _take_retry_token(details):
+    """Take a token from the geocoder's retry budget before ``backoff`` retries a request.
+
+    ``backoff`` only calls this once it is going to retry, so the last try
+    of a request doesn't use up a token. Without a token left the error is
+    raised instead of retrying.
+    """
+    budget = details['args'][0].retry_budget
+    if budget is not None and not budget.withdraw():
+        raise details['exception']
+
+
+def _parse_retry_after(value):
+    """Parse a ``Retry-After`` header value.
+
+    Args:
+        value: Header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
 class OpenCageGeocodeError(Exception):
     """Base class for all errors/exceptions that can happen when geocoding."""
 
@@ -100,11 +195,51 @@ class InvalidInputError(OpenCageGeocodeError):
 
 
 class UnknownError(OpenCageGeocodeError):
-    """There was a problem with the OpenCage server."""
+    """There was a problem with the OpenCage server.
+
+    Attributes:
+        retry_after: Seconds the server asked to wait before retrying, if
+            the response had a ``Retry-After`` header.
+    """
+
+    def __init__(self, *args, retry_after=None):
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UnknownError):
+    """Raised without sending the request while the circuit breaker is open.
+
+    The API failed repeatedly, so requests are held back for a while to
+    let it recover. ``retry_after`` is the number of seconds until the
+    circuit breaker lets a trial request through.
+    """
+
+    no_retry = True
+
+    def __unicode__(self):
+        """Convert exception to a string."""
+        return ("Not sending requests to the OpenCage API after repeated errors, "
+                f"trying again in {self.retry_after or 0:.0f}s")
+
+    __str__ = __unicode__
 
 
 class RateLimitExceededError(OpenCageGeocodeError):
-    """Exception raised when account has exceeded its limit."""
+    """Exception raised when account has exceeded its limit.
+
+    Attributes:
+        reset: Unix time requests may be sent again, if known: when the
+            daily quota resets, or shortly for too many requests per second.
+        status: HTTP status code of the response, 402 when the quota is
+            used up and 429 for too many requests per second, or None if
+            the request wasn't sent.
+    """
+
+    def __init__(self, *args, reset=None, status=None):
+        super().__init__(*args)
+        self.reset = reset
+        self.status = status
 
     def __unicode__(self):
         """Convert exception to a string."""
@@ -150,6 +285,94 @@ class SSLError(OpenCageGeocodeError):
     __str__ = __unicode__
 
 
+def _requests_session(pool_size, hosts=1):
+    """Create a requests session keeping up to ``pool_size`` connections open.
+
+    Args:
+        pool_size: Maximum number of connections kept open to each API host.
+        hosts: Number of API hosts; a pool is kept for each, so switching
+            between several domains doesn't close connections.
+
+    Returns:
+        A new ``requests.Session``.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_shared_session(hosts=1):
+    """Return the module-wide requests session, creating it on first use.
+
+    The sessions are created again in a forked child process, so parent
+    and child never share connections.
+
+    Args:
+        hosts: Number of API hosts the caller uses. Callers with a
+            different number of hosts get a session of their own, so a
+            session in use is never given a new adapter, which would drop
+            its open connections.
+
+    Returns:
+        A ``requests.Session`` with a pool of ``DEFAULT_POOL_SIZE`` connections per host.
+    """
+    global _shared_session_pid
+    with _shared_session_lock:
+        if _shared_session_pid != os.getpid():
+            _shared_sessions.clear()
+            _shared_session_pid = os.getpid()
+        if hosts not in _shared_sessions:
+            _shared_sessions[hosts] = _requests_session(DEFAULT_POOL_SIZE, hosts)
+        return _shared_sessions[hosts]
+
+
+def _import_aiohttp():
+    """Import aiohttp on first use, so sync-only users don't pay for it.
+
+    Returns:
+        The aiohttp module.
+
+    Raises:
+        AioHttpError: If aiohttp is not installed.
+    """
+    global aiohttp
+    if aiohttp is None:
+        if not AIOHTTP_AVAILABLE:
+            raise AioHttpError("You must install `aiohttp` to use async methods")
+        import aiohttp as module
+        aiohttp = module
+    return aiohttp
+
+
+def _is_aiohttp_session(session):
+    """Tell whether session is an aiohttp session, without importing aiohttp."""
+    module = sys.modules.get('aiohttp')
+    return module is not None and isinstance(session, module.ClientSession)
+
+
+def _async_retrying(func):
+    """Retry an async request method like the sync ones are retried.
+
+    The ``backoff`` decorator needs the aiohttp exception classes, so it
+    is applied on the first call rather than at import time.
+    """
+    retrying = None
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        nonlocal retrying
+        if retrying is None:
+            exceptions = (UnknownError, asyncio.TimeoutError, _import_aiohttp().ClientError)
+            retrying = backoff.on_exception(
+                retry_wait_gen, exceptions, max_tries=5, max_time=backoff_max_time, jitter=None,
+                giveup=_no_retry, on_backoff=_take_retry_token)(func)
+        return await retrying(*args, **kwargs)
+
+    return wrapper
+
+
 class OpenCageGeocode:
     """Client for the OpenCage Geocoding API.
 
@@ -170,58 +393,221 @@ class OpenCageGeocode:
             protocol='https',
             domain=DEFAULT_DOMAIN,
             sslcontext=None,
-            user_agent_comment=None):
+            user_agent_comment=None,
+            cache=None,
+            reverse_cache=None,
+            rate_limit=None,
+            pool_size=None,
+            keepalive_timeout=None,
+            dns_cache_ttl=None,
+            coalesce=False,
+            observer=None,
+            json_decoder=None,
+            default_params=None,
+            thread_safe=False,
+            circuit_breaker=None,
+            retry_budget=None,
+            hedge=None,
+            limit_per_host=None):
         """Initialize the geocoder.
 
         Args:
-            key: OpenCage API key. If not provided, reads from the
-                OPENCAGE_API_KEY environment variable.
+            key: OpenCage API key, or a list of keys to spread the requests
+                over. If not provided, reads from the OPENCAGE_API_KEY
+                environment variable.
             protocol: HTTP protocol to use, either 'http' or 'https'.
-            domain: API domain to connect to.
+            domain: API domain to connect to, or a list of domains.
             sslcontext: SSL context for async (aiohttp) connections.
             user_agent_comment: Optional comment appended to the User-Agent header.
+            cache: Optional response cache consulted before every API request,
+                an instance of a ``opencage.cache.BaseCache`` subclass. Pass
+                True to use a ``MemoryCache`` with default settings.
+            reverse_cache: Optional ``opencage.cache.ReverseGeocodeCache``
+                consulted by the reverse geocoding methods, which reuses
+                results for nearby coordinates. Pass True to use one with
+                default settings.
+            rate_limit: Optional client-side rate limit, either the maximum
+                number of requests per second or an ``opencage.ratelimit.RateLimiter``
+                (which can be shared between several instances).
+            pool_size: Maximum number of connections kept open to the API by
+                the sessions of ``with`` and ``async with`` blocks, and by
+                the pool owned with ``thread_safe=True``. Defaults to 10 for
+                sync and 100 for async sessions.
+            keepalive_timeout: Seconds an idle connection of an async session
+                is kept open for reuse (aiohttp default: 15).
+            dns_cache_ttl: Seconds an async session caches the DNS lookup of
+                the API host (aiohttp default: 10), None to keep the default.
+            coalesce: If True, identical requests made at the same time by
+                several threads or coroutines share a single API call. The
+                callers then get the same response object with raw_response=True.
+            observer: Optional callable, or object with an ``on_request``
+                method, called with an ``opencage.instrumentation.RequestInfo``
+                after every request (latency, status, retries, cache hit, ...).
+            json_decoder: JSON decoder for API responses: 'msgspec', 'orjson',
+                'json' or a function taking the body bytes. By default the
+                fastest installed one is used.
+            default_params: Optional dict of API parameters sent with every
+                request, e.g. ``{'no_annotations': 1, 'limit': 1}`` to trim
+                the responses. Parameters passed to a call override them,
+                passing None for one leaves it out.
+            thread_safe: If True, the instance owns a connection pool of
+                ``pool_size`` that all threads use for calls outside a
+                ``with`` block, and ``with`` blocks may overlap. Use this
+                to share one instance between the threads of a web server.
+            circuit_breaker: Optional ``opencage.resilience.CircuitBreaker``
+                which stops sending requests for a while after repeated
+                server or connection errors, raising ``CircuitOpenError``
+                instead. Pass True to use one with default settings.
+            retry_budget: Optional ``opencage.resilience.RetryBudget`` limiting
+                retries to a fraction of all requests. Pass True to use one
+                with default settings.
+            hedge: Optional ``opencage.hedging.HedgePolicy``: an async
+                request that takes longer than most is sent a second time
+                and the first answer is used. Sync requests, which can't be
+                abandoned halfway, aren't hedged. Pass True to use one with
+                default settings.
+            limit_per_host: Maximum number of connections an async session
+                opens to each API host, within ``pool_size`` (aiohttp
+                default: no limit). Sync pools already keep at most
+                ``pool_size`` connections per host.
+
+        With several keys or domains, requests are spread over them by an
+        ``opencage.endpoints.EndpointPool`` (``self.endpoints``): a key that
+        runs out of quota or is rejected is left out and the request is
+        sent again with another key, and a domain that keeps failing is
+        left out for a while.
 
         Raises:
             ValueError: If no API key is provided or found in the environment.
         """
-        self.key = key if key is not None else os.environ.get('OPENCAGE_API_KEY')
+        keys = list(key) if isinstance(key, (list, tuple)) else [key]
+        if key is None:
+            keys = [os.environ.get('OPENCAGE_API_KEY')]
 
-        if self.key is None:
+        if not keys or any(key is None for key in keys):
             raise ValueError(
                 "API key not provided. "
                 "Either pass a 'key' parameter or set the OPENCAGE_API_KEY environment variable."
             )
+        self.key = keys[0]
 
         if protocol and protocol not in ('http', 'https'):
             protocol = 'https'
-        domain = _validate_domain(domain)
-        self.url = protocol + '://' + domain + '/geocode/v1/json'
+        domains = domain if isinstance(domain, (list, tuple)) else [domain]
+        urls = [protocol + '://' + _validate_domain(domain) + '/geocode/v1/json' for domain in domains]
+        if not urls:
+            raise ValueError("Invalid API domain.")
+        self.url = urls[0]
+        self._hosts = len(urls)
+
+        self.endpoints = EndpointPool(keys, urls) if len(keys) > 1 or len(urls) > 1 else None
 
         # https://docs.aiohttp.org/en/stable/client_advanced.html#ssl-control-for-tcp-sockets
         self.sslcontext = sslcontext
 
         self.user_agent_comment = user_agent_comment
 
+        self.cache = MemoryCache() if cache is True else cache
+        self.reverse_cache = ReverseGeocodeCache() if reverse_cache is True else reverse_cache
+
+        if rate_limit is None or isinstance(rate_limit, RateLimiter):
+            self.rate_limiter = rate_limit
+        else:
+            self.rate_limiter = RateLimiter(rate=rate_limit)
+
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.limit_per_host = limit_per_host
+
+        self.coalesce = coalesce
+        self._single_flight = SingleFlight() if coalesce else None
+        self._async_single_flight = AsyncSingleFlight() if coalesce else None
+
+        self.observer = observer
+        self._observe = getattr(observer, 'on_request', observer)
+
+        self._json_loads = json_decoder if callable(json_decoder) else get_decoder(json_decoder)
+
+        self.default_params = dict(default_params or {})
+
+        self.circuit_breaker = CircuitBreaker() if circuit_breaker is True else circuit_breaker
+        self.retry_budget = RetryBudget() if retry_budget is True else retry_budget
+        self.hedge = HedgePolicy() if hedge is True else hedge
+
+        self.thread_safe = thread_safe
+        self._own_session = None
+        self._own_session_pid = None
+        self._own_session_lock = threading.Lock()
+
+    @property
+    def user_agent_comment(self):
+        """Optional comment appended to the User-Agent header."""
+        return self._user_agent_comment
+
+    @user_agent_comment.setter
+    def user_agent_comment(self, value):
+        self._user_agent_comment = value
+        self._headers = {}
+
     def __enter__(self):
         """Open a pooled requests session for sync geocoding.
 
         Overlapping or nested ``with`` blocks on the same instance are
         not supported and will raise ``RuntimeError`` to prevent silently
-        leaking the previous session's connection pool.
+        leaking the previous session's connection pool. With
+        ``thread_safe=True`` the instance's own pool is used instead and
+        ``with`` blocks may overlap.
         """
+        if self.thread_safe:
+            return self
         if self.session is not None:
             raise RuntimeError(
                 "OpenCageGeocode context already entered; "
                 "overlapping `with` blocks on the same instance are not supported."
             )
-        self.session = requests.Session()
+        self.session = _requests_session(self.pool_size or DEFAULT_POOL_SIZE, self._hosts)
         return self
 
     def __exit__(self, *args):
+        if self.thread_safe:
+            return False
         self.session.close()
         self.session = None
         return False
 
+    def close(self):
+        """Close the connections of the pool owned with ``thread_safe=True``.
+
+        The pool is opened again if the instance is used afterwards.
+        """
+        with self._own_session_lock:
+            session, self._own_session = self._own_session, None
+        if session is not None:
+            session.close()
+
+    def _default_session(self):
+        """Return the requests session for calls outside a ``with`` block.
+
+        That is the instance's own session with ``thread_safe=True``, or
+        else the session shared by all instances. Either is created again
+        in a forked child process.
+        """
+        if not self.thread_safe:
+            return _get_shared_session(self._hosts)
+
+        session = self._own_session
+        if session is not None and self._own_session_pid == os.getpid():
+            return session
+        with self._own_session_lock:
+            if self._own_session is None or self._own_session_pid != os.getpid():
+                session = _requests_session(self.pool_size or DEFAULT_POOL_SIZE, self._hosts)
+                # the API doesn't use cookies; don't share a cookie jar between threads
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                self._own_session = session
+                self._own_session_pid = os.getpid()
+            return self._own_session
+
     async def __aenter__(self):
         """Open a pooled aiohttp session for async geocoding.
 
@@ -229,15 +615,26 @@ class OpenCageGeocode:
         are not supported and will raise ``RuntimeError`` to prevent
         silently leaking the previous session's connection pool.
         """
-        if not AIOHTTP_AVAILABLE:
-            raise AioHttpError("You must install `aiohttp` to use async methods")
+        _import_aiohttp()
 
         if self.session is not None:
             raise RuntimeError(
                 "OpenCageGeocode context already entered; "
                 "overlapping `async with` blocks on the same instance are not supported."
             )
-        self.session = aiohttp.ClientSession()
+        connector_options = {}
+        if self.pool_size is not None:
+            connector_options['limit'] = self.pool_size
+        if self.keepalive_timeout is not None:
+            connector_options['keepalive_timeout'] = self.keepalive_timeout
+        if self.dns_cache_ttl is not None:
+            connector_options['ttl_dns_cache'] = self.dns_cache_ttl
+        if self.limit_per_host is not None:
+            connector_options['limit_per_host'] = self.limit_per_host
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(**connector_options),
+            headers=self._opencage_headers('aiohttp'),
+        )
         return self
 
     async def __aexit__(self, *args):
@@ -252,7 +649,8 @@ class OpenCageGeocode:
             query: Address or place name to geocode.
             **kwargs: Additional API parameters (e.g. language, countrycode).
                 Pass raw_response=True to get the full API response dict
-                instead of just the results list.
+                instead of just the results list, or result_type='objects'
+                to get ``opencage.results.Result`` objects instead of dicts.
 
         Returns:
             List of geocoding results with lat/lng and components, or the
@@ -265,17 +663,64 @@ class OpenCageGeocode:
             AioHttpError: If called inside an async context manager.
         """
 
-        if self.session and isinstance(self.session, aiohttp.client.ClientSession):
-            raise AioHttpError("Cannot use `geocode` in an async context, use `geocode_async`.")
+        self._check_sync_context()
 
-        raw_response = kwargs.pop('raw_response', False)
-        request = self._parse_request(query, kwargs)
-        response = self._opencage_request(request)
+        return self._geocode(query, kwargs)
+
+    def _geocode(self, query, params, session=None):
+        """Run one synchronous geocoding request and post-process the response.
+
+        Args:
+            query: Address or place name to geocode.
+            params: Dict of additional API parameters; may include
+                raw_response and result_type.
+            session: Optional requests session to send the request with.
+
+        Returns:
+            List of geocoding results, or the full API response dict if
+            raw_response=True.
+        """
+        raw_response, result_type = _pop_output_options(params)
+        request = self._parse_request(query, params)
+        response = self._opencage_request(request, session=session)
 
         if raw_response:
             return response
 
-        return floatify_latlng(response['results'])
+        return self._format_results(response, result_type)
+
+    def geocode_many(self, queries, max_workers=DEFAULT_CONCURRENCY, return_exceptions=False, **kwargs):
+        """Geocode many address strings concurrently using a thread pool.
+
+        The worker threads share one ``requests.Session`` whose connection
+        pool is sized to ``max_workers``, so connections are reused across
+        queries instead of doing a new TCP and TLS handshake for each one.
+
+        Args:
+            queries: Iterable of address or place name strings.
+            max_workers: Number of worker threads, and so the maximum number
+                of requests in flight at once, or an
+                ``opencage.concurrency.AdaptiveConcurrency`` to adjust it to
+                how the API copes.
+            return_exceptions: If True, a failed query puts its exception
+                in the result list instead of aborting the whole batch.
+            **kwargs: Additional API parameters, passed along for every query.
+
+        Returns:
+            List with one entry per query, in the same order as the input.
+
+        Raises:
+            ValueError: If max_workers is less than 1.
+            AioHttpError: If called inside an async context manager.
+            OpenCageGeocodeError: The first error raised by any query, unless
+                return_exceptions=True.
+        """
+        self._check_sync_context()
+
+        def geocode_one(session, query):
+            return self._geocode(query, dict(kwargs), session=session)
+
+        return self._run_in_threads(geocode_one, queries, max_workers, return_exceptions)
 
     async def geocode_async(self, query, **kwargs):
         """Async version of geocode.
@@ -286,7 +731,8 @@ class OpenCageGeocode:
             query: Address or place name to geocode.
             **kwargs: Additional API parameters (e.g. language, countrycode).
                 Pass raw_response=True to get the full API response dict
-                instead of just the results list.
+                instead of just the results list, or result_type='objects'
+                to get ``opencage.results.Result`` objects instead of dicts.
 
         Returns:
             List of geocoding results with lat/lng and components, or the
@@ -299,23 +745,171 @@ class OpenCageGeocode:
             AioHttpError: If aiohttp is not installed or no async session is active.
         """
 
-        if not AIOHTTP_AVAILABLE:
-            raise AioHttpError("You must install `aiohttp` to use async methods.")
-
-        if not self.session:
-            raise AioHttpError("Async methods must be used inside an async context.")
-
-        if not isinstance(self.session, aiohttp.client.ClientSession):
-            raise AioHttpError("You must use `geocode_async` in an async context.")
+        self._check_async_session()
 
-        raw_response = kwargs.pop('raw_response', False)
+        raw_response, result_type = _pop_output_options(kwargs)
         request = self._parse_request(query, kwargs)
         response = await self._opencage_async_request(request)
 
         if raw_response:
             return response
 
-        return floatify_latlng(response['results'])
+        return self._format_results(response, result_type)
+
+    async def geocode_batch_async(self, queries, concurrency=DEFAULT_CONCURRENCY,
+                                  return_exceptions=False, **kwargs):
+        """Geocode many address strings concurrently over the async session.
+
+        All requests share the session opened by ``async with`` and no more
+        than ``concurrency`` of them are in flight at any time.
+
+        Args:
+            queries: Iterable of address or place name strings.
+            concurrency: Maximum number of requests in flight at once, or an
+                ``opencage.concurrency.AdaptiveConcurrency`` to adjust it to
+                how the API copes.
+            return_exceptions: If True, a failed query puts its exception
+                in the result list instead of aborting the whole batch.
+            **kwargs: Additional API parameters, passed to ``geocode_async``
+                for every query.
+
+        Returns:
+            List with one entry per query, in the same order as the input.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+            AioHttpError: If aiohttp is not installed or no async session is active.
+            OpenCageGeocodeError: The first error raised by any query, unless
+                return_exceptions=True.
+        """
+        self._check_async_session()
+        _check_concurrency(concurrency, 'concurrency')
+
+        queries = list(queries)
+        results = [None] * len(queries)
+
+        stream = self._run_async(enumerate(queries), concurrency,
+                                 lambda item: self.geocode_async(item[1], **kwargs))
+        try:
+            async for (index, _), result in stream:
+                if isinstance(result, Exception) and not return_exceptions:
+                    raise result
+                results[index] = result
+        finally:
+            await stream.aclose()
+
+        return results
+
+    async def geocode_stream_async(self, queries, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        """Geocode a stream of address strings, yielding results as they complete.
+
+        Unlike ``geocode_batch_async`` the input is never collected into a
+        list: the next query is only taken from ``queries`` when fewer than
+        ``concurrency`` requests are in flight, so a fast source is held
+        back by a slow API and memory use stays bounded.
+
+        A failed query doesn't end the stream, its exception is yielded in
+        place of the results. Closing the generator (``aclose``, or leaving
+        an ``async with contextlib.aclosing(...)`` block) cancels the
+        requests still in flight.
+
+        Args:
+            queries: Async iterable (e.g. an async generator reading from a
+                message queue) or plain iterable of address strings.
+            concurrency: Maximum number of requests in flight at once, or an
+                ``opencage.concurrency.AdaptiveConcurrency``.
+            **kwargs: Additional API parameters, passed to ``geocode_async``
+                for every query.
+
+        Yields:
+            ``(query, result)`` tuples in completion order, where result is
+            what ``geocode_async`` returned or the exception it raised.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+            AioHttpError: If aiohttp is not installed or no async session is active.
+        """
+        self._check_async_session()
+        _check_concurrency(concurrency, 'concurrency')
+
+        stream = self._run_async(queries, concurrency, lambda query: self.geocode_async(query, **kwargs))
+        try:
+            async for query, result in stream:
+                yield query, result
+        finally:
+            await stream.aclose()
+
+    async def _run_async(self, items, concurrency, func):
+        """Await ``func(item)`` for every item, with a limited number in flight.
+
+        The next item is only taken from ``items`` when there is room for
+        another request.
+
+        Args:
+            items: Async or plain iterable of input items.
+            concurrency: Maximum number in flight, or an ``AdaptiveConcurrency``
+                that is told how each call went.
+            func: Callable taking one item and returning an awaitable.
+
+        Yields:
+            ``(item, result)`` tuples in completion order, where result is
+            the exception if one was raised.
+        """
+        if hasattr(items, '__aiter__'):
+            iterator, aiterator = None, items.__aiter__()
+        else:
+            iterator, aiterator = iter(items), None
+        in_flight = {}
+        next_item = None
+        exhausted = False
+
+        def start(item):
+            in_flight[asyncio.ensure_future(func(item))] = (item, time.monotonic())
+
+        try:
+            while True:
+                room = _current_limit(concurrency) - len(in_flight)
+                if iterator is not None and not exhausted and room > 0:
+                    taken = list(itertools.islice(iterator, room))
+                    exhausted = len(taken) < room
+                    for item in taken:
+                        start(item)
+                elif aiterator is not None and next_item is None and not exhausted and room > 0:
+                    # wait for the next input as a task, so finished requests are
+                    # yielded while a slow source has nothing new
+                    next_item = asyncio.ensure_future(aiterator.__anext__())
+
+                waiting = set(in_flight)
+                if next_item is not None:
+                    waiting.add(next_item)
+                if not waiting:
+                    return
+
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if next_item in done:
+                    try:
+                        start(next_item.result())
+                    except StopAsyncIteration:
+                        exhausted = True
+                    next_item = None
+
+                for task in [task for task in in_flight if task in done]:
+                    item, started = in_flight.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        result = exc
+                    _record_call(concurrency, started, result)
+                    yield item, result
+        finally:
+            tasks = list(in_flight)
+            if next_item is not None:
+                tasks.append(next_item)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
 
     def reverse_geocode(self, lat, lng, **kwargs):
         """Reverse geocode a latitude/longitude pair into an address.
@@ -324,6 +918,7 @@ class OpenCageGeocode:
             lat: Latitude (-90 to 90).
             lng: Longitude (-180 to 180).
             **kwargs: Additional API parameters (e.g. language, countrycode).
+                Accepts raw_response and result_type like ``geocode``.
 
         Returns:
             List of geocoding results with address components.
@@ -335,8 +930,159 @@ class OpenCageGeocode:
         """
 
         self._validate_lat_lng(lat, lng)
+        self._check_sync_context()
+
+        return self._reverse_geocode(lat, lng, kwargs)
+
+    def _reverse_geocode(self, lat, lng, params, session=None):
+        """Run one synchronous reverse geocoding request, using the reverse cache.
+
+        Args:
+            lat: Latitude, already validated.
+            lng: Longitude, already validated.
+            params: Dict of additional API parameters; may include
+                raw_response and result_type.
+            session: Optional requests session to send the request with.
+
+        Returns:
+            List of geocoding results, or the full API response dict if
+            raw_response=True.
+        """
+        query = _query_for_reverse_geocoding(lat, lng)
+        if self.reverse_cache is None:
+            return self._geocode(query, params, session=session)
+
+        raw_response, result_type = _pop_output_options(params)
+        params_key = cache_key(dict(self.default_params, **params))
+        response = self.reverse_cache.get(lat, lng, params_key)
+        if response is None:
+            response = self._geocode(query, dict(params, raw_response=True), session=session)
+            self.reverse_cache.set(lat, lng, response, params_key)
+        else:
+            self._report_cache_hit(query, params)
+
+        if raw_response:
+            return response
+
+        return self._format_results(response, result_type)
+
+    def reverse_geocode_many(self, points, max_workers=DEFAULT_CONCURRENCY, return_exceptions=False, **kwargs):
+        """Reverse geocode many latitude/longitude pairs using a thread pool.
+
+        See ``geocode_many`` for how the worker threads share connections.
+
+        Args:
+            points: Iterable of ``(lat, lng)`` pairs.
+            max_workers: Number of worker threads, and so the maximum number
+                of requests in flight at once, or an
+                ``opencage.concurrency.AdaptiveConcurrency`` to adjust it to
+                how the API copes.
+            return_exceptions: If True, a failed point puts its exception
+                in the result list instead of aborting the whole batch.
+            **kwargs: Additional API parameters, passed along for every point.
+
+        Returns:
+            List with one entry per point, in the same order as the input.
 
-        return self.geocode(_query_for_reverse_geocoding(lat, lng), **kwargs)
+        Raises:
+            ValueError: If max_workers is less than 1.
+            AioHttpError: If called inside an async context manager.
+            OpenCageGeocodeError: The first error raised by any point, unless
+                return_exceptions=True.
+        """
+        self._check_sync_context()
+
+        def reverse_geocode_one(session, point):
+            lat, lng = point
+            self._validate_lat_lng(lat, lng)
+            return self._reverse_geocode(lat, lng, dict(kwargs), session=session)
+
+        return self._run_in_threads(reverse_geocode_one, points, max_workers, return_exceptions)
+
+    def _run_in_threads(self, func, items, max_workers, return_exceptions):
+        """Call ``func(session, item)`` for every item on a pool of threads.
+
+        Args:
+            func: Callable taking a requests session and one input item.
+            items: Iterable of input items.
+            max_workers: Number of worker threads, or an ``AdaptiveConcurrency``
+                deciding how many of its ``max_limit`` threads are busy.
+            return_exceptions: If True, store exceptions as results instead
+                of raising the first one.
+
+        Returns:
+            List of results in input order.
+        """
+        _check_concurrency(max_workers, 'max_workers')
+
+        items = list(items)
+        pool_size = _max_limit(max_workers)
+
+        with self._pooled_session(pool_size) as session, ThreadPoolExecutor(pool_size) as executor:
+            if not isinstance(max_workers, AdaptiveConcurrency):
+                futures = [executor.submit(func, session, item) for item in items]
+            else:
+                futures = self._submit_adaptive(executor, func, session, items, max_workers,
+                                                stop_on_error=not return_exceptions)
+
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as exc:
+                    if not return_exceptions:
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        raise
+                    results.append(exc)
+
+        return results
+
+    def _submit_adaptive(self, executor, func, session, items, limiter, stop_on_error):
+        """Submit calls to ``executor``, keeping ``limiter.limit`` of them running.
+
+        Blocks until every item has been submitted, or with stop_on_error
+        until a call has failed.
+
+        Returns:
+            List of futures in input order.
+        """
+        def call(item):
+            started = time.monotonic()
+            try:
+                result = func(session, item)
+            except Exception as exc:
+                _record_call(limiter, started, exc)
+                raise
+            _record_call(limiter, started, result)
+            return result
+
+        futures = []
+        running = set()
+        for item in items:
+            while len(running) >= limiter.limit:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                if stop_on_error and any(future.exception() for future in done):
+                    return futures
+            future = executor.submit(call, item)
+            futures.append(future)
+            running.add(future)
+        return futures
+
+    @contextlib.contextmanager
+    def _pooled_session(self, pool_size):
+        """Open a requests session with a connection pool of ``pool_size``.
+
+        Args:
+            pool_size: Maximum number of connections kept open per host.
+
+        Yields:
+            A ``requests.Session``, closed again when the block exits.
+        """
+        session = _requests_session(pool_size, self._hosts)
+        try:
+            yield session
+        finally:
+            session.close()
 
     async def reverse_geocode_async(self, lat, lng, **kwargs):
         """Async version of reverse_geocode.
@@ -347,6 +1093,7 @@ class OpenCageGeocode:
             lat: Latitude (-90 to 90).
             lng: Longitude (-180 to 180).
             **kwargs: Additional API parameters (e.g. language, countrycode).
+                Accepts raw_response and result_type like ``geocode``.
 
         Returns:
             List of geocoding results with address components.
@@ -359,17 +1106,79 @@ class OpenCageGeocode:
 
         self._validate_lat_lng(lat, lng)
 
-        return await self.geocode_async(_query_for_reverse_geocoding(lat, lng), **kwargs)
+        query = _query_for_reverse_geocoding(lat, lng)
+        if self.reverse_cache is None:
+            return await self.geocode_async(query, **kwargs)
+
+        raw_response, result_type = _pop_output_options(kwargs)
+        params_key = cache_key(dict(self.default_params, **kwargs))
+        response = self.reverse_cache.get(lat, lng, params_key)
+        if response is None:
+            response = await self.geocode_async(query, raw_response=True, **kwargs)
+            self.reverse_cache.set(lat, lng, response, params_key)
+        else:
+            self._report_cache_hit(query, kwargs)
+
+        if raw_response:
+            return response
+
+        return self._format_results(response, result_type)
+
+    def _opencage_request(self, params, session=None):
+        """Return the API response for a request, from the cache if possible.
+
+        With ``coalesce`` enabled, a request identical to one already in
+        flight waits for that one's response instead of calling the API.
+
+        Args:
+            params: Dict of query parameters for the API request.
+            session: Optional requests session to use instead of the one
+                opened by ``with``.
+
+        Returns:
+            Parsed JSON response dict from the API.
+        """
+        with self._observing(params) as info:
+            if self.cache is None and self._single_flight is None:
+                self._count_request()
+                return self._opencage_fetch(params, session=session, info=info)
+
+            key = cache_key(params)
+            if self.cache is not None:
+                response_json = self.cache.get(key)
+                if response_json is not None:
+                    if info is not None:
+                        info.cache_hit = True
+                    return response_json
+
+            self._count_request()
+            if self._single_flight is not None:
+                response_json = self._single_flight.do(
+                    key, lambda: self._opencage_fetch(params, session=session, info=info))
+            else:
+                response_json = self._opencage_fetch(params, session=session, info=info)
+
+            if self.cache is not None:
+                self.cache.set(key, response_json)
+            return response_json
 
     @backoff.on_exception(
-        backoff.expo,
+        retry_wait_gen,
         (UnknownError, requests.exceptions.RequestException),
-        max_tries=5, max_time=backoff_max_time)
-    def _opencage_request(self, params):
+        max_tries=5, max_time=backoff_max_time, jitter=None,
+        giveup=_no_retry, on_backoff=_take_retry_token)
+    def _opencage_fetch(self, params, session=None, info=None):
         """Send a synchronous geocoding request to the OpenCage API.
 
+        Server and connection errors are retried, unless the circuit
+        breaker or retry budget say otherwise.
+
         Args:
             params: Dict of query parameters for the API request.
+            session: Optional requests session to use instead of the one
+                opened by ``with``. Outside a ``with`` block a session shared
+                by all instances is used, so connections are reused.
+            info: Optional ``RequestInfo`` to record the response details in.
 
         Returns:
             Parsed JSON response dict from the API.
@@ -378,64 +1187,285 @@ class OpenCageGeocode:
             NotAuthorizedError: If the API key is invalid.
             ForbiddenError: If the API key is blocked or suspended.
             RateLimitExceededError: If the rate limit is exceeded.
+            CircuitOpenError: If the circuit breaker is open.
             UnknownError: If the server returns an error or invalid JSON.
         """
-        if self.session:
-            response = self.session.get(self.url, params=params, headers=self._opencage_headers('aiohttp'), timeout=30)
-        else:
-            response = requests.get(self.url, params=params, headers=self._opencage_headers('requests'), timeout=30)
+        self._check_circuit()
+        try:
+            response_json = self._opencage_fetch_once(params, session, info)
+        except (UnknownError, requests.exceptions.RequestException) as exc:
+            self._request_failed(exc)
+            raise
+        return response_json
 
+    def _count_request(self):
+        """Add a request to the retry budget."""
+        if self.retry_budget is not None:
+            self.retry_budget.deposit()
+
+    def _check_circuit(self):
+        """Raise ``CircuitOpenError`` if the circuit breaker holds requests back."""
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            raise CircuitOpenError(retry_after=self.circuit_breaker.retry_after())
+
+    def _request_answered(self):
+        """Tell the circuit breaker the API answered a request."""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+    def _request_failed(self, exc):
+        """Record a server or connection error.
+
+        The exception is marked not to be retried if the circuit breaker
+        has opened.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
+            if self.circuit_breaker.state == CircuitBreaker.OPEN:
+                exc.no_retry = True
+
+    def _may_hedge(self, info=None):
+        """Whether to send a hedged request now.
+
+        Not while the rate limiter would hold it back or the quota is
+        used up, nor once ``self.hedge`` has hedged its share of requests.
+        """
+        if self.rate_limiter is not None and not self.rate_limiter.available():
+            return False
+        if not self.hedge.allow():
+            return False
+        if info is not None:
+            info.hedged = True
+        return True
+
+    def _opencage_fetch_once(self, params, session=None, info=None):
+        """Send a request, without retries.
+
+        With several keys or domains, the request is sent with the key
+        and to the domain picked by ``self.endpoints``, and sent again
+        straight away with another key if its key is refused.
+        """
+        if self.endpoints is None:
+            return self._opencage_send(self.url, params, session, info)
+
+        while True:
+            key, url = self._choose_endpoint()
+            start = time.perf_counter()
+            try:
+                response_json = self._opencage_send(url, dict(params, key=key), session, info)
+            except (RateLimitExceededError, ForbiddenError, NotAuthorizedError) as exc:
+                if not self._key_failed(key, exc):
+                    raise
+                continue
+            except (UnknownError, requests.exceptions.RequestException):
+                self.endpoints.url_failed(url)
+                raise
+            self.endpoints.succeeded(key, url, time.perf_counter() - start, response_json)
+            return response_json
+
+    def _choose_endpoint(self):
+        """Pick the key and URL for a request from ``self.endpoints``.
+
+        Raises:
+            ForbiddenError: If all keys were rejected by the API.
+            RateLimitExceededError: If all keys are out of quota.
+        """
+        endpoint = self.endpoints.choose()
+        if endpoint is None:
+            if self.endpoints.all_keys_rejected():
+                raise ForbiddenError()
+            raise RateLimitExceededError(reset=self.endpoints.quota_reset(), status=self.endpoints.quota_status())
+        return endpoint
+
+    def _key_failed(self, key, exc):
+        """Tell ``self.endpoints`` about a refused key; return whether to try another."""
+        return self.endpoints.key_failed(key, reset=getattr(exc, 'reset', None),
+                                         rejected=not isinstance(exc, RateLimitExceededError),
+                                         status=getattr(exc, 'status', None))
+
+    def _opencage_send(self, url, params, session=None, info=None):
+        """Send one request to the OpenCage API and check the response.
+
+        Args:
+            url: API URL to send the request to.
+            params: Dict of query parameters for the API request.
+            session: Optional requests session, see ``_opencage_fetch``.
+            info: Optional ``RequestInfo`` to record the response details in.
+
+        Returns:
+            Parsed JSON response dict from the API.
+        """
+        if info is not None:
+            info.tries += 1
+
+        if self.rate_limiter is not None and not self.rate_limiter.acquire():
+            raise RateLimitExceededError()
+
+        session = session or self.session or self._default_session()
+        response = session.get(url, params=params, headers=self._opencage_headers('requests'), timeout=30)
+
+        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+        if info is not None:
+            info.status = response.status_code
+            info.bytes = len(response.content)
+
+        parse_start = time.perf_counter()
         try:
-            response_json = response.json()
+            response_json = self._json_loads(response.content)
         except ValueError as excinfo:
-            raise UnknownError("Non-JSON result from server") from excinfo
+            raise UnknownError("Non-JSON result from server", retry_after=retry_after) from excinfo
 
-        if response.status_code == 401:
-            raise NotAuthorizedError()
+        if info is not None:
+            info.parse_time = time.perf_counter() - parse_start
+            info.remaining = _quota_remaining(response_json, response.headers)
 
-        if response.status_code == 403:
-            raise ForbiddenError()
+        if self.rate_limiter is not None and self.endpoints is None:
+            self.rate_limiter.update(response_json, response.headers)
 
-        if response.status_code in (402, 429):
-            raise RateLimitExceededError()
+        self._check_response(response.status_code, response_json, response.headers, retry_after)
+        return response_json
 
-        if response.status_code == 500:
-            raise UnknownError("500 status code from API")
+    def _check_response(self, status, response_json, headers, retry_after=None):
+        """Raise the error for an API response, and tell the circuit breaker it answered.
 
-        if 'results' not in response_json:
+        Server errors and malformed responses count as failures for the
+        circuit breaker, every other response as the API answering, even
+        if it refuses the request.
+
+        Args:
+            status: HTTP status code.
+            response_json: Parsed response body.
+            headers: Response headers.
+            retry_after: Seconds from the ``Retry-After`` header, if any.
+        """
+        if status == 500:
+            raise UnknownError("500 status code from API", retry_after=retry_after)
+
+        if status not in (401, 402, 403, 429) and 'results' not in response_json:
             raise UnknownError("JSON from API doesn't have a 'results' key")
 
-        return response_json
+        self._request_answered()
+
+        if status == 401:
+            raise NotAuthorizedError()
+
+        if status == 403:
+            raise ForbiddenError()
+
+        if status in (402, 429):
+            raise RateLimitExceededError(reset=_quota_reset(status, response_json, headers, retry_after),
+                                         status=status)
 
     def _opencage_headers(self, client):
-        """Build the HTTP headers for an API request.
+        """Return the HTTP headers for an API request.
+
+        The headers are built once per client and kept until
+        ``user_agent_comment`` is changed. Don't modify the returned dict.
 
         Args:
             client: HTTP client name ('requests' or 'aiohttp').
 
         Returns:
-            Dict with User-Agent header.
+            Dict with User-Agent and Accept-Encoding headers.
         """
-        client_version = requests.__version__
-        if client == 'aiohttp':
-            client_version = aiohttp.__version__
+        headers = self._headers.get(client)
+        if headers is None:
+            client_version = requests.__version__
+            if client == 'aiohttp':
+                client_version = _import_aiohttp().__version__
 
-        py_version = '.'.join(str(x) for x in sys.version_info[0:3])
+            comment = ''
+            if self.user_agent_comment:
+                clean = self.user_agent_comment.replace('\r', '').replace('\n', '')
+                comment = f" ({clean})"
 
-        comment = ''
-        if self.user_agent_comment:
-            clean = self.user_agent_comment.replace('\r', '').replace('\n', '')
-            comment = f" ({clean})"
-
-        return {
-            'User-Agent': f"opencage-python/{__version__} Python/{py_version} {client}/{client_version}{comment}"
-        }
+            user_agent = f"opencage-python/{__version__} Python/{PYTHON_VERSION} {client}/{client_version}{comment}"
+            headers = self._headers[client] = {'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING}
+        return headers
 
     async def _opencage_async_request(self, params):
+        """Async version of _opencage_request.
+
+        Args:
+            params: Dict of query parameters for the API request.
+
+        Returns:
+            Parsed JSON response dict from the API.
+        """
+        with self._observing(params) as info:
+            if self.cache is None and self._async_single_flight is None:
+                self._count_request()
+                return await self._opencage_async_fetch(params, info=info)
+
+            key = cache_key(params)
+            if self.cache is not None:
+                response_json = self.cache.get(key)
+                if response_json is not None:
+                    if info is not None:
+                        info.cache_hit = True
+                    return response_json
+
+            self._count_request()
+            if self._async_single_flight is not None:
+                response_json = await self._async_single_flight.do(
+                    key, lambda: self._opencage_async_fetch(params, info=info))
+            else:
+                response_json = await self._opencage_async_fetch(params, info=info)
+
+            if self.cache is not None:
+                self.cache.set(key, response_json)
+            return response_json
+
+    def _report_cache_hit(self, query, params):
+        """Report a request answered from the reverse geocoding cache to the observer."""
+        if self._observe is not None:
+            info = RequestInfo(dict(params, q=query), time.time())
+            info.cache_hit = True
+            self._notify_observer(info)
+
+    @contextlib.contextmanager
+    def _observing(self, params):
+        """Time a request and report it to the observer, if there is one.
+
+        Args:
+            params: Dict of query parameters for the API request.
+
+        Yields:
+            A ``RequestInfo`` for the fetch methods to fill in, or None if
+            there is no observer.
+        """
+        if self._observe is None:
+            yield None
+            return
+
+        info = RequestInfo(params, time.time())
+        start = time.perf_counter()
+        try:
+            yield info
+        except Exception as exc:
+            info.error = exc
+            raise
+        finally:
+            info.latency = time.perf_counter() - start
+            self._notify_observer(info)
+
+    def _notify_observer(self, info):
+        """Pass ``info`` to the observer; errors in it are logged, never raised."""
+        try:
+            self._observe(info)
+        except Exception:
+            logger.exception("Request observer %r raised an exception", self.observer)
+
+    @_async_retrying
+    async def _opencage_async_fetch(self, params, info=None):
         """Send an async geocoding request to the OpenCage API.
 
+        Failed requests are retried like in the sync version, waiting with
+        ``asyncio.sleep`` so other requests on the event loop carry on.
+
         Args:
             params: Dict of query parameters for the API request.
+            info: Optional ``RequestInfo`` to record the response details in.
 
         Returns:
             Parsed JSON response dict from the API.
@@ -444,44 +1474,164 @@ class OpenCageGeocode:
             NotAuthorizedError: If the API key is invalid.
             ForbiddenError: If the API key is blocked or suspended.
             RateLimitExceededError: If the rate limit is exceeded.
+            CircuitOpenError: If the circuit breaker is open.
             UnknownError: If the server returns an error or invalid JSON.
             SSLError: If the SSL connection fails.
         """
+        self._check_circuit()
         try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with self.session.get(self.url, params=params, ssl=self.sslcontext, timeout=timeout) as response:
-                try:
-                    response_json = await response.json()
-                except ValueError as excinfo:
-                    raise UnknownError("Non-JSON result from server") from excinfo
+            if self.hedge is not None:
+                response_json = await self._opencage_async_fetch_hedged(params, info)
+            else:
+                response_json = await self._opencage_async_fetch_once(params, info)
+        except (UnknownError, asyncio.TimeoutError, aiohttp.ClientError) as exc:
+            self._request_failed(exc)
+            raise
+        return response_json
 
-                if response.status == 401:
-                    raise NotAuthorizedError()
+    async def _opencage_async_fetch_hedged(self, params, info=None):
+        """Send a request, and a hedged one if it is slow, without retries.
+
+        The first successful answer is returned and the slower request is
+        cancelled.
+        """
+        delay = self.hedge.delay()
+        if delay is None:
+            return await self._async_hedge_attempt(params, info)
+
+        attempts = [asyncio.ensure_future(self._async_hedge_attempt(params, info))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._may_hedge(info):
+                attempts.append(asyncio.ensure_future(self._async_hedge_attempt(params, info)))
+                pending = set(attempts)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for attempt in attempts:
+                        if attempt in done and attempt.exception() is None:
+                            return attempt.result()
+            return await attempts[0]
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+
+    async def _async_hedge_attempt(self, params, info=None):
+        """Send a request and tell ``self.hedge`` how long it took."""
+        start = time.perf_counter()
+        response_json = await self._opencage_async_fetch_once(params, info)
+        self.hedge.record(time.perf_counter() - start)
+        return response_json
 
-                if response.status == 403:
-                    raise ForbiddenError()
+    async def _opencage_async_fetch_once(self, params, info=None):
+        """Async version of ``_opencage_fetch_once``."""
+        if self.endpoints is None:
+            return await self._opencage_async_send(self.url, params, info)
+
+        while True:
+            key, url = self._choose_endpoint()
+            start = time.perf_counter()
+            try:
+                response_json = await self._opencage_async_send(url, dict(params, key=key), info)
+            except (RateLimitExceededError, ForbiddenError, NotAuthorizedError) as exc:
+                if not self._key_failed(key, exc):
+                    raise
+                continue
+            except (UnknownError, asyncio.TimeoutError, aiohttp.ClientError):
+                self.endpoints.url_failed(url)
+                raise
+            self.endpoints.succeeded(key, url, time.perf_counter() - start, response_json)
+            return response_json
+
+    async def _opencage_async_send(self, url, params, info=None):
+        """Async version of ``_opencage_send``."""
+        if info is not None:
+            info.tries += 1
+
+        if self.rate_limiter is not None and not await self.rate_limiter.acquire_async():
+            raise RateLimitExceededError()
 
-                if response.status in (402, 429):
-                    raise RateLimitExceededError()
+        try:
+            timeout = aiohttp.ClientTimeout(total=30)
+            async with self.session.get(url, params=params, ssl=self.sslcontext, timeout=timeout) as response:
+                retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                body = await response.read()
+                if info is not None:
+                    info.status = response.status
+                    info.bytes = len(body)
+
+                parse_start = time.perf_counter()
+                try:
+                    response_json = self._json_loads(body)
+                except ValueError as excinfo:
+                    raise UnknownError("Non-JSON result from server", retry_after=retry_after) from excinfo
 
-                if response.status == 500:
-                    raise UnknownError("500 status code from API")
+                if info is not None:
+                    info.parse_time = time.perf_counter() - parse_start
+                    info.remaining = _quota_remaining(response_json, response.headers)
 
-                if 'results' not in response_json:
-                    raise UnknownError("JSON from API doesn't have a 'results' key")
+                if self.rate_limiter is not None and self.endpoints is None:
+                    self.rate_limiter.update(response_json, response.headers)
 
+                self._check_response(response.status, response_json, response.headers, retry_after)
                 return response_json
         except aiohttp.ClientSSLError as exp:
             raise SSLError() from exp
         except aiohttp.client_exceptions.ClientConnectorCertificateError as exp:
             raise SSLError() from exp
 
+    def _check_async_session(self):
+        """Ensure an aiohttp session from ``async with`` is active.
+
+        Raises:
+            AioHttpError: If aiohttp is not installed or no async session is active.
+        """
+        _import_aiohttp()
+
+        if not self.session:
+            raise AioHttpError("Async methods must be used inside an async context.")
+
+        if not _is_aiohttp_session(self.session):
+            raise AioHttpError("You must use `geocode_async` in an async context.")
+
+    def _format_results(self, response, result_type='dicts'):
+        """Convert the results of an API response for returning to the caller.
+
+        For dicts, a response that may also be held by a cache or shared
+        with coalesced callers is copied first, any other is converted in
+        place to save copying every result.
+
+        Args:
+            response: Parsed JSON response dict from the API.
+            result_type: 'dicts' or 'objects'.
+
+        Returns:
+            List of results with lat/lng values as floats, as dicts or
+            ``opencage.results.Result`` objects.
+        """
+        if result_type == 'objects':
+            return results_from_response(response)
+        if self.cache is not None or self.reverse_cache is not None or self.coalesce:
+            return floatify_latlng(response['results'])
+        return floatify_results(response['results'], in_place=True)
+
+    def _check_sync_context(self):
+        """Ensure no async session is active for a synchronous call.
+
+        Raises:
+            AioHttpError: If called inside an async context manager.
+        """
+        if self.session and _is_aiohttp_session(self.session):
+            raise AioHttpError("Cannot use `geocode` in an async context, use `geocode_async`.")
+
     def _parse_request(self, query, params):
         """Build the request parameters dict for an API call.
 
         Args:
             query: The geocoding query string.
-            params: Additional API parameters from the caller.
+            params: Additional API parameters from the caller, which
+                override ``default_params``. Parameters set to None are
+                left out.
 
         Returns:
             Dict of parameters ready to send to the API.
@@ -494,7 +1644,10 @@ class OpenCageGeocode:
             raise InvalidInputError(error_message, bad_value=query)
 
         data = {'q': query, 'key': self.key}
+        data.update(self.default_params)
         data.update(params)  # Add user parameters
+        for name in [name for name, value in data.items() if value is None]:
+            del data[name]
         return data
 
     def _validate_lat_lng(self, lat, lng):
@@ -523,6 +1676,85 @@ class OpenCageGeocode:
             raise InvalidInputError(f"Longitude must be a number between -180 and 180, not {lng}", bad_value=lng)
 
 
+def _check_concurrency(concurrency, name):
+    if not isinstance(concurrency, AdaptiveConcurrency) and concurrency < 1:
+        raise ValueError(f"{name} must be at least 1")
+
+
+def _current_limit(concurrency):
+    if isinstance(concurrency, AdaptiveConcurrency):
+        return concurrency.limit
+    return concurrency
+
+
+def _max_limit(concurrency):
+    if isinstance(concurrency, AdaptiveConcurrency):
+        return concurrency.max_limit
+    return concurrency
+
+
+def _is_overload(exc):
+    """Whether ``exc`` shows the API, or the way to it, is overloaded."""
+    if isinstance(exc, (RateLimitExceededError, UnknownError, requests.RequestException, asyncio.TimeoutError)):
+        return True
+    return aiohttp is not None and isinstance(exc, aiohttp.ClientError)
+
+
+def _record_call(concurrency, started, result):
+    """Tell an ``AdaptiveConcurrency`` how a call that began at ``started`` went."""
+    if not isinstance(concurrency, AdaptiveConcurrency):
+        return
+    if not isinstance(result, Exception):
+        concurrency.record(time.monotonic() - started)
+    elif _is_overload(result):
+        concurrency.record(time.monotonic() - started, overloaded=True)
+
+
+def _quota_value(response_json, headers, name):
+    """Return a value of the ``rate`` block or ``X-RateLimit-*`` headers of a response, or None."""
+    rate = response_json.get('rate') if isinstance(response_json, dict) else None
+    value = rate.get(name) if isinstance(rate, dict) else headers.get(f"X-RateLimit-{name.capitalize()}")
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _quota_remaining(response_json, headers):
+    """Return the remaining quota reported by an API response, or None."""
+    return _quota_value(response_json, headers, 'remaining')
+
+
+def _quota_reset(status, response_json, headers, retry_after=None):
+    """Return the Unix time requests may be sent again after a 402 or 429 response, or None.
+
+    A 402 means the daily quota is used up until the reported reset, a 429
+    that too many requests were sent per second, so it is soon.
+    """
+    if status == 429:
+        return time.time() + (retry_after if retry_after is not None else 1)
+    return _quota_value(response_json, headers, 'reset')
+
+
+def _pop_output_options(params):
+    """Remove the options controlling the return value from request parameters.
+
+    Args:
+        params: Dict of parameters passed to a geocoding method.
+
+    Returns:
+        Tuple of raw_response (bool) and result_type ('dicts' or 'objects').
+
+    Raises:
+        ValueError: If result_type is not a known value.
+    """
+    raw_response = params.pop('raw_response', False)
+    result_type = params.pop('result_type', 'dicts')
+    if result_type not in RESULT_TYPES:
+        raise ValueError(f"result_type must be one of {', '.join(RESULT_TYPES)}, not {result_type!r}")
+    return raw_response, result_type
+
+
 def _query_for_reverse_geocoding(lat, lng):
     """Build the query string for a reverse geocoding request.
 
@@ -568,7 +1800,7 @@ def floatify_latlng(input_value):
         The same structure with lat/lng string values converted to floats.
     """
     if isinstance(input_value, collections.abc.Mapping):
-        if len(input_value) == 2 and sorted(input_value.keys()) == ['lat', 'lng']:
+        if len(input_value) == 2 and 'lat' in input_value and 'lng' in input_value:
             # This dict has only 2 keys 'lat' & 'lon'
             return {'lat': float_if_float(input_value["lat"]), 'lng': float_if_float(input_value["lng"])}
 
@@ -578,3 +1810,49 @@ def floatify_latlng(input_value):
         return [floatify_latlng(x) for x in input_value]
 
     return input_value
+
+
+def _floatify_point(point, in_place):
+    """Convert the values of a {'lat': ..., 'lng': ...} dict to floats."""
+    if in_place:
+        point['lat'] = float_if_float(point['lat'])
+        point['lng'] = float_if_float(point['lng'])
+        return point
+    return {'lat': float_if_float(point['lat']), 'lng': float_if_float(point['lng'])}
+
+
+def floatify_results(results, in_place=False):
+    """Convert string lat/lng values to floats in a list of API results.
+
+    A faster alternative to ``floatify_latlng`` which only looks at the
+    places where the API returns coordinates: ``geometry`` and the
+    ``northeast`` and ``southwest`` corners of ``bounds``.
+
+    Args:
+        results: The ``results`` list from an API response.
+        in_place: If True, convert the given dicts in place. Otherwise new
+            dicts are made for the results and the converted parts, while
+            all other values (components, annotations, ...) are shared
+            with the input.
+
+    Returns:
+        List of results with lat/lng values converted to floats.
+    """
+    if not in_place:
+        results = [dict(result) for result in results]
+
+    for result in results:
+        geometry = result.get('geometry')
+        if isinstance(geometry, dict) and 'lat' in geometry and 'lng' in geometry:
+            result['geometry'] = _floatify_point(geometry, in_place)
+
+        bounds = result.get('bounds')
+        if isinstance(bounds, dict):
+            if not in_place:
+                bounds = result['bounds'] = dict(bounds)
+            for corner in ('northeast', 'southwest'):
+                point = bounds.get(corner)
+                if isinstance(point, dict) and 'lat' in point and 'lng' in point:
+                    bounds[corner] = _floatify_point(point, in_place)
+
+    return results
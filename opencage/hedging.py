@@ -0,0 +1,78 @@
+"""Hedged requests for the OpenCage geocoder.
+
+A hedged request is a second, identical request sent when the first one
+is taking longer than most requests do. Whichever answers first is used
+and the other one is cancelled, which cuts the tail latency caused by
+the occasional slow connection at the cost of a few extra requests.
+Only async requests are hedged: a sync request can't be cancelled, so
+the caller would wait for the slow one anyway.
+"""
+
+import collections
+import math
+import threading
+
+from .resilience import RetryBudget
+
+
+class HedgePolicy:
+    """Decides when to send a hedged request.
+
+    A request is hedged once it has taken longer than the ``percentile``
+    of recent request latencies, kept within ``min_delay`` and
+    ``max_delay``. Until ``min_samples`` latencies are known no request
+    is hedged.
+
+    At most ``max_ratio`` of the requests are hedged: like a
+    ``RetryBudget``, every request adds ``max_ratio`` tokens and every
+    hedged request takes one. ``OpenCageGeocode`` also doesn't hedge while
+    its rate limiter would hold the extra request back.
+
+    Args:
+        percentile: Percentile of recent latencies after which to hedge.
+        min_delay: Minimum seconds to wait before hedging.
+        max_delay: Maximum seconds to wait before hedging.
+        max_ratio: Fraction of requests that may be hedged.
+        window: Number of recent latencies the percentile is taken over.
+        min_samples: Number of latencies needed before hedging starts.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.01, max_delay=5.0, max_ratio=0.05, window=200, min_samples=20):
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if not 1 <= min_samples <= window:
+            raise ValueError("Expected 1 <= min_samples <= window")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self._latencies = collections.deque(maxlen=window)
+        self._budget = RetryBudget(ratio=max_ratio, min_per_second=0, max_tokens=max(1, window * max_ratio))
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Count a request and return how long to wait before hedging it.
+
+        Returns:
+            Seconds, or None if the request shouldn't be hedged.
+        """
+        self._budget.deposit()
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, math.ceil(len(latencies) * self.percentile / 100) - 1)
+        return min(self.max_delay, max(self.min_delay, latencies[index]))
+
+    def allow(self):
+        """Take a token for a hedged request.
+
+        Returns:
+            True if the request may be hedged.
+        """
+        return self._budget.withdraw()
+
+    def record(self, latency):
+        """Record the latency of a successful request."""
+        with self._lock:
+            self._latencies.append(latency)
@@ -0,0 +1,142 @@
+"""Metrics and tracing hooks for the OpenCage geocoder.
+
+Pass an ``observer`` to ``OpenCageGeocode`` to be told about every
+request: either a callable taking a ``RequestInfo``, or an object with an
+``on_request(info)`` method such as the ``PrometheusObserver`` and
+``OpenTelemetryObserver`` defined here.
+"""
+
+import importlib
+
+
+class RequestInfo:
+    """What happened during one geocoding request.
+
+    Attributes:
+        params: Request parameters, without the API key.
+        started: Wall clock time the request started, in seconds since the epoch.
+        latency: Total seconds taken, including retries and waiting for
+            the rate limiter.
+        tries: Number of HTTP requests sent, hedged ones included, 0 if the
+            response came from a cache or was shared with an identical
+            request in flight.
+        status: HTTP status code of the last response, or None.
+        bytes: Size of the last response body in bytes.
+        parse_time: Seconds spent decoding the last response body.
+        cache_hit: Whether the response came from a cache.
+        remaining: Requests left in the quota according to the response, or None.
+        error: The exception the request failed with, or None.
+        hedged: Whether a hedged second request was sent.
+    """
+
+    __slots__ = ('params', 'started', 'latency', 'tries', 'status', 'bytes', 'parse_time',
+                 'cache_hit', 'remaining', 'error', 'hedged')
+
+    def __init__(self, params, started):
+        self.params = {name: value for name, value in params.items() if name != 'key'}
+        self.started = started
+        self.latency = 0.0
+        self.tries = 0
+        self.status = None
+        self.bytes = 0
+        self.parse_time = 0.0
+        self.cache_hit = False
+        self.remaining = None
+        self.error = None
+        self.hedged = False
+
+    @property
+    def retries(self):
+        """Number of retries after the first try, not counting a hedged request."""
+        return max(0, self.tries - 1 - self.hedged)
+
+    def __repr__(self):
+        return (f"RequestInfo(status={self.status!r}, latency={self.latency:.3f}, tries={self.tries}, "
+                f"cache_hit={self.cache_hit}, error={self.error!r})")
+
+
+class Observer:
+    """Base class for request observers. Override ``on_request``."""
+
+    def on_request(self, info):
+        """Called with a ``RequestInfo`` after every request."""
+
+
+def _import_optional(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError as exc:
+        package = name.split('.')[0].replace('_', '-')
+        raise ImportError(f"You must install `{package}` to use this observer") from exc
+
+
+class PrometheusObserver(Observer):
+    """Records requests as Prometheus metrics; requires ``prometheus-client``.
+
+    Metrics (with the default prefix):
+
+    - ``opencage_requests_total``, labelled by status and cache hit
+    - ``opencage_request_duration_seconds`` histogram
+    - ``opencage_retries_total``
+    - ``opencage_response_bytes_total``
+    - ``opencage_quota_remaining`` gauge
+
+    Args:
+        registry: Prometheus registry, by default the global one.
+        prefix: Prefix of the metric names.
+    """
+
+    def __init__(self, registry=None, prefix='opencage'):
+        prometheus = _import_optional('prometheus_client')
+        options = {} if registry is None else {'registry': registry}
+        self.requests = prometheus.Counter(
+            f"{prefix}_requests", "Geocoding requests", ['status', 'cache'], **options)
+        self.duration = prometheus.Histogram(
+            f"{prefix}_request_duration_seconds", "Geocoding request latency", **options)
+        self.retries = prometheus.Counter(
+            f"{prefix}_retries", "Retried geocoding requests", **options)
+        self.response_bytes = prometheus.Counter(
+            f"{prefix}_response_bytes", "Bytes received from the API", **options)
+        self.quota_remaining = prometheus.Gauge(
+            f"{prefix}_quota_remaining", "Requests left in the API quota", **options)
+
+    def on_request(self, info):
+        status = str(info.status) if info.status is not None else type(info.error).__name__
+        self.requests.labels(status=status, cache='hit' if info.cache_hit else 'miss').inc()
+        self.duration.observe(info.latency)
+        if info.retries:
+            self.retries.inc(info.retries)
+        if info.bytes:
+            self.response_bytes.inc(info.bytes)
+        if info.remaining is not None:
+            self.quota_remaining.set(info.remaining)
+
+
+class OpenTelemetryObserver(Observer):
+    """Records every request as an OpenTelemetry span; requires ``opentelemetry-api``.
+
+    Args:
+        tracer: Tracer to create spans with, by default one for this module.
+    """
+
+    def __init__(self, tracer=None):
+        self._trace = _import_optional('opentelemetry.trace')
+        self.tracer = tracer or self._trace.get_tracer(__name__)
+
+    def on_request(self, info):
+        start_ns = int(info.started * 1e9)
+        span = self.tracer.start_span('opencage.geocode', start_time=start_ns)
+        span.set_attribute('opencage.query', str(info.params.get('q', '')))
+        span.set_attribute('opencage.tries', info.tries)
+        span.set_attribute('opencage.cache_hit', info.cache_hit)
+        span.set_attribute('opencage.hedged', info.hedged)
+        span.set_attribute('opencage.response_bytes', info.bytes)
+        span.set_attribute('opencage.parse_time', info.parse_time)
+        if info.status is not None:
+            span.set_attribute('http.status_code', info.status)
+        if info.remaining is not None:
+            span.set_attribute('opencage.quota_remaining', info.remaining)
+        if info.error is not None:
+            span.record_exception(info.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(info.error)))
+        span.end(end_time=start_ns + int(info.latency * 1e9))
@@ -0,0 +1,136 @@
+"""Client-side rate limiting for the OpenCage geocoder."""
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket that paces API requests on the client side.
+
+    One limiter can be shared by the sync and async methods, by several
+    threads and by several ``OpenCageGeocode`` instances using the same
+    API key.
+
+    Besides the per-second rate, the limiter tracks the daily quota the
+    API reports in the ``rate`` block of each response and in the
+    ``X-RateLimit-*`` headers. Once the quota is used up, requests fail
+    with ``RateLimitExceededError`` straight away until the quota resets,
+    instead of being sent only to be rejected.
+
+    Args:
+        rate: Maximum requests per second, or None to only track the quota.
+        burst: Number of requests that may be sent back-to-back before
+            pacing kicks in.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token.
+
+        Returns:
+            Seconds to wait before sending the request, or None if the
+            daily quota is known to be used up.
+        """
+        with self._lock:
+            if self.remaining is not None:
+                if self.reset is not None and time.time() >= self.reset:
+                    # quota has been renewed, wait for the next response to learn the new numbers
+                    self.remaining = None
+                elif self.remaining <= 0 and self.reset is not None:
+                    return None
+                else:
+                    self.remaining -= 1
+
+            if self.rate is None:
+                return 0
+
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def available(self):
+        """Tell whether a request could be sent right now without waiting.
+
+        Nothing is taken from the limiter; used to decide on optional
+        extra requests such as hedged ones.
+        """
+        with self._lock:
+            if self.remaining is not None and self.remaining <= 0 and (self.reset or 0) > time.time():
+                return False
+            if self.rate is None:
+                return True
+            tokens = self._tokens + (time.monotonic() - self._updated) * self.rate
+            return tokens >= 1
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent.
+
+        Returns:
+            True once the request may be sent, False if the daily quota
+            is used up.
+        """
+        delay = self._reserve()
+        if delay is None:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be sent.
+
+        Returns:
+            True once the request may be sent, False if the daily quota
+            is used up.
+        """
+        delay = self._reserve()
+        if delay is None:
+            return False
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    def update(self, response_json=None, headers=None):
+        """Adjust the quota from an API response.
+
+        Args:
+            response_json: Parsed response body, may contain a ``rate`` block.
+            headers: Response headers, may contain ``X-RateLimit-*`` values.
+        """
+        rate = {}
+        if isinstance(response_json, dict) and isinstance(response_json.get('rate'), dict):
+            rate = dict(response_json['rate'])
+        if headers is not None:
+            for name in ('limit', 'remaining', 'reset'):
+                value = headers.get(f"X-RateLimit-{name.capitalize()}")
+                if value is not None:
+                    rate.setdefault(name, value)
+
+        with self._lock:
+            try:
+                if 'limit' in rate:
+                    self.limit = int(rate['limit'])
+                if 'remaining' in rate:
+                    self.remaining = int(rate['remaining'])
+                if 'reset' in rate:
+                    self.reset = int(rate['reset'])
+            except (TypeError, ValueError):
+                pass
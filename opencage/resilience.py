@@ -0,0 +1,147 @@
+"""Circuit breaker and retry budget for the OpenCage geocoder.
+
+Both limit how hard the client hits the API while it is having trouble:
+the circuit breaker stops sending requests for a while after repeated
+errors, the retry budget caps retries at a fraction of all requests.
+One instance of either can be shared by several ``OpenCageGeocode``
+instances, threads and event loops.
+"""
+
+import threading
+import time
+
+
+class CircuitBreaker:
+    """Stops sending requests to an API that keeps failing.
+
+    The breaker starts out closed, letting requests through. After
+    ``failure_threshold`` server or connection errors in a row it opens:
+    requests fail straight away with ``CircuitOpenError`` for
+    ``recovery_timeout`` seconds. Then it is half-open and lets a single
+    trial request through; if that succeeds the breaker closes again,
+    otherwise it opens for another ``recovery_timeout``.
+
+    Args:
+        failure_threshold: Number of consecutive errors that open the breaker.
+        recovery_timeout: Seconds to stay open before letting a trial request through.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half-open'."""
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened is None:
+            return self.CLOSED
+        if now - self._opened < self.recovery_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """Tell whether a request may be sent now.
+
+        In the half-open state only one trial request is let through; if
+        it never reports back, another one is let through after
+        ``recovery_timeout``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(now)
+            if state == self.CLOSED:
+                return True
+            if state == self.OPEN:
+                return False
+            if self._trial_started is not None and now - self._trial_started < self.recovery_timeout:
+                return False
+            self._trial_started = now
+            return True
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial request through, 0 if it would now."""
+        with self._lock:
+            if self._opened is None:
+                return 0
+            return max(0.0, self._opened + self.recovery_timeout - time.monotonic())
+
+    def record_success(self):
+        """Record a request the API answered, which closes the breaker."""
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial_started = None
+
+    def record_failure(self):
+        """Record a server or connection error."""
+        now = time.monotonic()
+        with self._lock:
+            self._failures += 1
+            if self._opened is not None or self._failures >= self.failure_threshold:
+                self._opened = now
+                self._trial_started = None
+
+
+class RetryBudget:
+    """Limits retries to a fraction of the requests sent.
+
+    Every request adds ``ratio`` tokens, every retry takes one; a retry
+    without a token left isn't made and the error is raised instead.
+    ``min_per_second`` tokens are added over time on top, so a client
+    with little traffic can still retry. Tokens never exceed ``max_tokens``.
+
+    With the defaults, retries add at most about 10% to the load on the
+    API, instead of up to four retries for every failed request.
+
+    Args:
+        ratio: Retries allowed per request.
+        min_per_second: Retries allowed per second regardless of traffic.
+        max_tokens: Maximum number of retries saved up, by default 10.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_tokens=10):
+        if ratio < 0 or min_per_second < 0:
+            raise ValueError("ratio and min_per_second must not be negative")
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + amount + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Record a request."""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self):
+        """Take a token for a retry.
+
+        Returns:
+            True if the retry may be made.
+        """
+        with self._lock:
+            self._refill(0)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
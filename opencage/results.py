@@ -0,0 +1,311 @@
+"""Compact result containers for the OpenCage geocoder.
+
+``Result`` objects are returned by the geocoding methods when called with
+``result_type='objects'``, as a lighter alternative to nested dicts.
+``ResultColumns`` collects the results of a batch into columns.
+"""
+
+from array import array
+import collections.abc
+import importlib
+import math
+
+RESULT_TYPES = ('dicts', 'objects')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class Geometry:
+    """A point.
+
+    Attributes:
+        lat: Latitude as float.
+        lng: Longitude as float.
+    """
+
+    __slots__ = ('lat', 'lng')
+
+    def __init__(self, lat, lng):
+        self.lat = lat
+        self.lng = lng
+
+    @classmethod
+    def from_dict(cls, point):
+        return cls(_to_float(point['lat']), _to_float(point['lng']))
+
+    def to_dict(self):
+        return {'lat': self.lat, 'lng': self.lng}
+
+    def __eq__(self, other):
+        if not isinstance(other, Geometry):
+            return NotImplemented
+        return (self.lat, self.lng) == (other.lat, other.lng)
+
+    def __repr__(self):
+        return f"Geometry(lat={self.lat!r}, lng={self.lng!r})"
+
+
+class Bounds:
+    """A bounding box.
+
+    Attributes:
+        northeast: North-east corner as ``Geometry``.
+        southwest: South-west corner as ``Geometry``.
+    """
+
+    __slots__ = ('northeast', 'southwest')
+
+    def __init__(self, northeast, southwest):
+        self.northeast = northeast
+        self.southwest = southwest
+
+    @classmethod
+    def from_dict(cls, bounds):
+        return cls(Geometry.from_dict(bounds['northeast']), Geometry.from_dict(bounds['southwest']))
+
+    def to_dict(self):
+        return {'northeast': self.northeast.to_dict(), 'southwest': self.southwest.to_dict()}
+
+    def __eq__(self, other):
+        if not isinstance(other, Bounds):
+            return NotImplemented
+        return (self.northeast, self.southwest) == (other.northeast, other.southwest)
+
+    def __repr__(self):
+        return f"Bounds(northeast={self.northeast!r}, southwest={self.southwest!r})"
+
+
+class Components(collections.abc.Mapping):
+    """Read-only address components of a result.
+
+    Works like a dict (``components['city']``, ``components.get('road')``)
+    and also gives attribute access, returning None for components the
+    result doesn't have (``components.postcode``).
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self._data.get(name)
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def __repr__(self):
+        return f"Components({self._data!r})"
+
+
+class Result:
+    """One geocoding result.
+
+    The commonly used fields are attributes. Everything else the API
+    returned, including ``annotations``, is kept as it came from the
+    response, without copying, and shares its nested dicts with it.
+
+    Attributes:
+        formatted: Formatted address string.
+        confidence: Confidence score (0-10), or None.
+        geometry: Position as ``Geometry``, or None.
+        bounds: Bounding box as ``Bounds``, or None.
+        components: Address components as ``Components``.
+    """
+
+    __slots__ = ('formatted', 'confidence', 'geometry', 'bounds', 'components', '_rest')
+
+    def __init__(self, formatted=None, confidence=None, geometry=None, bounds=None, components=None, rest=None):
+        self.formatted = formatted
+        self.confidence = confidence
+        self.geometry = geometry
+        self.bounds = bounds
+        self.components = Components(components or {})
+        self._rest = rest
+
+    @classmethod
+    def from_dict(cls, result):
+        """Build a result from one entry of the API ``results`` list."""
+        rest = {key: value for key, value in result.items()
+                if key not in ('formatted', 'confidence', 'geometry', 'bounds', 'components')}
+        geometry = result.get('geometry')
+        bounds = result.get('bounds')
+        return cls(
+            formatted=result.get('formatted'),
+            confidence=result.get('confidence'),
+            geometry=Geometry.from_dict(geometry) if geometry else None,
+            bounds=Bounds.from_dict(bounds) if bounds else None,
+            components=result.get('components'),
+            rest=rest or None,
+        )
+
+    @property
+    def extra(self):
+        """New dict of all other fields the API returned."""
+        return dict(self._rest) if self._rest else {}
+
+    @property
+    def annotations(self):
+        """The result's annotations dict, shared with the response; don't modify it."""
+        return self._rest.get('annotations', {}) if self._rest else {}
+
+    def to_dict(self):
+        """Convert back to the dict form returned with ``result_type='dicts'``."""
+        result = self.extra
+        if self.formatted is not None:
+            result['formatted'] = self.formatted
+        if self.confidence is not None:
+            result['confidence'] = self.confidence
+        if self.geometry is not None:
+            result['geometry'] = self.geometry.to_dict()
+        if self.bounds is not None:
+            result['bounds'] = self.bounds.to_dict()
+        result['components'] = self.components.to_dict()
+        return result
+
+    def __repr__(self):
+        return f"Result(formatted={self.formatted!r}, geometry={self.geometry!r})"
+
+
+def results_from_response(response):
+    """Build ``Result`` objects from a parsed API response dict."""
+    return [Result.from_dict(result) for result in response['results']]
+
+
+class ResultColumns:
+    """Collects batch geocoding results into columns, one row per query.
+
+    Coordinates and confidence are kept in ``array('d')`` columns and the
+    strings in lists, so a large batch takes far less memory than a list
+    of result dicts. Missing values are NaN, or None for strings.
+
+    The columns can be exported to NumPy, pandas, Arrow or Parquet if
+    those packages are installed.
+
+    Args:
+        components: Names of address components to collect as extra
+            string columns, e.g. ``['city', 'postcode']``.
+    """
+
+    def __init__(self, components=('country_code',)):
+        self.lat = array('d')
+        self.lng = array('d')
+        self.confidence = array('d')
+        self.formatted = []
+        self.components = {name: [] for name in components}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def append(self, results):
+        """Add a row from the results of one query.
+
+        Args:
+            results: List of result dicts or ``Result`` objects, of which
+                the first is used. An empty list or an exception (e.g.
+                from ``return_exceptions=True``) adds a row of missing values.
+        """
+        if isinstance(results, Exception) or not results:
+            self._append_row(math.nan, math.nan, math.nan, None, {})
+        elif isinstance(results[0], Result):
+            result = results[0]
+            lat, lng = (result.geometry.lat, result.geometry.lng) if result.geometry else (math.nan, math.nan)
+            self._append_row(lat, lng, result.confidence, result.formatted, result.components)
+        else:
+            result = results[0]
+            geometry = result.get('geometry') or {}
+            self._append_row(geometry.get('lat', math.nan), geometry.get('lng', math.nan),
+                             result.get('confidence'), result.get('formatted'), result.get('components') or {})
+
+    def add_response(self, response):
+        """Add a row from a raw API response, as returned with ``raw_response=True``."""
+        self.append(response['results'])
+
+    def _append_row(self, lat, lng, confidence, formatted, components):
+        self.lat.append(_nan_if_missing(lat))
+        self.lng.append(_nan_if_missing(lng))
+        self.confidence.append(_nan_if_missing(confidence))
+        self.formatted.append(formatted)
+        for name, column in self.components.items():
+            column.append(components.get(name))
+
+    def columns(self):
+        """Return a dict of column name to column."""
+        columns = {
+            'lat': self.lat,
+            'lng': self.lng,
+            'confidence': self.confidence,
+            'formatted': self.formatted,
+        }
+        columns.update(self.components)
+        return columns
+
+    def to_numpy(self, copy=True):
+        """Return a dict of column name to NumPy array.
+
+        Args:
+            copy: If False, the numeric arrays share memory with the
+                collector instead of being copied. No more results can be
+                appended while such arrays exist.
+        """
+        numpy = _import_optional('numpy')
+        arrays = {}
+        for name, column in self.columns().items():
+            if not isinstance(column, array):
+                arrays[name] = numpy.array(column, dtype=object)
+            elif copy:
+                arrays[name] = numpy.array(column, dtype=numpy.float64)
+            else:
+                arrays[name] = numpy.frombuffer(column, dtype=numpy.float64)
+        return arrays
+
+    def to_pandas(self):
+        """Return the columns as a ``pandas.DataFrame``."""
+        pandas = _import_optional('pandas')
+        return pandas.DataFrame(self.to_numpy())
+
+    def to_arrow(self):
+        """Return the columns as a ``pyarrow.Table``."""
+        pyarrow = _import_optional('pyarrow')
+        return pyarrow.table({
+            name: pyarrow.array(column, type=pyarrow.float64() if isinstance(column, array) else pyarrow.string())
+            for name, column in self.columns().items()
+        })
+
+    def to_parquet(self, path):
+        """Write the columns to a Parquet file."""
+        parquet = _import_optional('pyarrow.parquet')
+        parquet.write_table(self.to_arrow(), path)
+
+
+def _nan_if_missing(value):
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _import_optional(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError as exc:
+        package = name.split('.')[0]
+        raise ImportError(f"You must install `{package}` to use this export") from exc
@@ -0,0 +1,94 @@
+"""Coalescing of identical in-flight requests ("single flight")."""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Lets concurrent threads asking for the same key share one call.
+
+    The first thread to ask for a key runs the function, threads asking
+    for the same key while it runs wait for it and get the same result
+    or exception. Nothing is kept once the call has finished.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Return ``func()``, sharing the call with other threads using ``key``.
+
+        Args:
+            key: Hashable key identifying the call.
+            func: Callable without arguments.
+
+        Returns:
+            The return value of ``func``, possibly from another thread's call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """Lets concurrent coroutines asking for the same key share one call.
+
+    The call runs as a task of its own, so a caller being cancelled
+    doesn't cancel it for the others waiting on the same key.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, func):
+        """Return ``await func()``, sharing the call with other coroutines using ``key``.
+
+        Args:
+            key: Hashable key identifying the call.
+            func: Coroutine function without arguments.
+
+        Returns:
+            The result of ``func``, possibly from another coroutine's call.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # mark the exception as retrieved in case every caller was cancelled
+            task.exception()
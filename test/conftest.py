@@ -0,0 +1,21 @@
+# encoding: utf-8
+
+import pytest
+from aiohttp import web
+
+
+@pytest.fixture
+def mock_api(aiohttp_server):
+    """Start a local stand-in for the OpenCage API.
+
+    Returns an async factory taking an aiohttp request handler. The
+    server answers on ``/geocode/v1/json`` and the factory returns the
+    ``localhost:port`` domain to pass to ``OpenCageGeocode``.
+    """
+    async def start(handler):
+        app = web.Application()
+        app.router.add_get('/geocode/v1/json', handler)
+        server = await aiohttp_server(app)
+        return f"localhost:{server.port}"
+
+    return start
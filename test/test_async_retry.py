@@ -0,0 +1,90 @@
+# encoding: utf-8
+
+import os
+import time
+
+import pytest
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode, UnknownError, retry_wait_gen, _parse_retry_after
+
+# reduce maximum backoff retry time from 120s to 1s
+os.environ['BACKOFF_MAX_TIME'] = '1'
+
+
+def test_wait_gen_full_jitter():
+    wait = retry_wait_gen()
+    next(wait)
+    for n in range(5):
+        assert 0 <= wait.send(UnknownError()) <= 2 ** n
+
+
+def test_wait_gen_honors_retry_after():
+    wait = retry_wait_gen()
+    next(wait)
+    assert wait.send(UnknownError(retry_after=0.25)) == 0.25
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after('3') == 3.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after('soon') is None
+    assert _parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+@pytest.mark.asyncio
+async def test_retries_500_then_succeeds(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            return web.json_response({}, status=500, headers={'Retry-After': '0'})
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        assert await geocoder.geocode_async('somewhere') == []
+
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_non_json_gives_up_with_unknown_error(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.Response(text='<h1>503 Service Unavailable</h1>', status=503,
+                            content_type='text/html', headers={'Retry-After': '0.1'})
+
+    domain = await mock_api(handler)
+    start = time.monotonic()
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        with pytest.raises(UnknownError) as excinfo:
+            await geocoder.geocode_async('somewhere')
+
+    assert str(excinfo.value) == 'Non-JSON result from server'
+    assert calls > 1
+    assert time.monotonic() - start < 2
+
+
+@pytest.mark.asyncio
+async def test_retries_connection_errors(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            request.transport.close()
+            return web.Response()
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        assert await geocoder.geocode_async('somewhere') == []
+
+    assert calls == 2
@@ -0,0 +1,79 @@
+# encoding: utf-8
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode, AioHttpError, NotAuthorizedError
+
+
+@pytest.mark.asyncio
+async def test_results_in_input_order(mock_api):
+    async def handler(request):
+        query = request.query['q']
+        # answer later queries first to shuffle completion order
+        await asyncio.sleep(0.01 * (5 - int(query)))
+        return web.json_response({'results': [{'formatted': query, 'geometry': {'lat': '1.5', 'lng': '2'}}]})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        results = await geocoder.geocode_batch_async([str(i) for i in range(5)], concurrency=5)
+
+    assert [r[0]['formatted'] for r in results] == ['0', '1', '2', '3', '4']
+    assert results[0][0]['geometry'] == {'lat': 1.5, 'lng': 2.0}
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(mock_api):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        results = await geocoder.geocode_batch_async(['x'] * 20, concurrency=3)
+
+    assert len(results) == 20
+    assert peak <= 3
+
+
+@pytest.mark.asyncio
+async def test_return_exceptions(mock_api):
+    async def handler(request):
+        if request.query['q'] == 'bad':
+            return web.json_response({'status': {'code': 401}}, status=401)
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        results = await geocoder.geocode_batch_async(['good', 'bad', 'good'], return_exceptions=True)
+
+        assert results[0] == []
+        assert isinstance(results[1], NotAuthorizedError)
+        assert results[2] == []
+
+        with pytest.raises(NotAuthorizedError):
+            await geocoder.geocode_batch_async(['good', 'bad', 'good'])
+
+
+@pytest.mark.asyncio
+async def test_without_async_session():
+    geocoder = OpenCageGeocode('abcde')
+
+    with pytest.raises(AioHttpError):
+        await geocoder.geocode_batch_async(['Atlantis'])
+
+
+@pytest.mark.asyncio
+async def test_invalid_concurrency():
+    async with OpenCageGeocode('abcde') as geocoder:
+        with pytest.raises(ValueError):
+            await geocoder.geocode_batch_async(['Atlantis'], concurrency=0)
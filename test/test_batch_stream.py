@@ -0,0 +1,269 @@
+# encoding: utf-8
+
+import asyncio
+import io
+import json
+
+import pytest
+from aiohttp import web
+
+from opencage.batch import Checkpoint, read_rows, row_query, run
+from opencage.geocoder import OpenCageGeocode, InvalidInputError, NotAuthorizedError, RateLimitExceededError
+from opencage.resilience import CircuitBreaker
+
+
+async def _echo_handler(request):
+    query = request.query['q']
+    if query == 'slow':
+        await asyncio.sleep(0.05)
+    return web.json_response({'results': [{
+        'formatted': query,
+        'geometry': {'lat': '1.5', 'lng': '2'},
+        'components': {'country_code': 'gb'},
+    }]})
+
+
+def test_read_rows():
+    assert list(read_rows(io.StringIO('a,b\nc,d\n'))) == [['a', 'b'], ['c', 'd']]
+    assert list(read_rows(io.StringIO('"x"\n\n{"query": "y"}\n'), 'jsonl')) == ['x', {'query': 'y'}]
+    with pytest.raises(ValueError):
+        list(read_rows(io.StringIO(''), 'xml'))
+
+
+def test_row_query():
+    assert row_query(['London', 'UK']) == 'London'
+    assert row_query(['London', ' UK'], input_columns=[1, 2]) == 'London, UK'
+    assert row_query(['51.5', '-0.1'], reverse=True) == ('51.5', '-0.1')
+    assert row_query({'lat': 51.5, 'lng': -0.1}, reverse=True) == (51.5, -0.1)
+    assert row_query('London') == 'London'
+    with pytest.raises(InvalidInputError):
+        row_query({'address': 'London'})
+
+
+@pytest.mark.asyncio
+async def test_csv_output_in_input_order(mock_api):
+    domain = await mock_api(_echo_handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+    infile = io.StringIO('address\nslow\nfast\n')
+    outfile = io.StringIO()
+
+    count = await run(geocoder, infile, outfile, headers=True, concurrency=2,
+                      output_columns=['lat', 'lng', 'country_code', 'formatted'])
+
+    assert count == 2
+    assert outfile.getvalue().splitlines() == [
+        'address,lat,lng,country_code,formatted',
+        'slow,1.5,2.0,gb,slow',
+        'fast,1.5,2.0,gb,fast',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_reverse_with_bad_row(mock_api):
+    domain = await mock_api(_echo_handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+    infile = io.StringIO('{"lat": 51.5, "lng": -0.1}\n{"lat": 100, "lng": 0}\n')
+    outfile = io.StringIO()
+
+    await run(geocoder, infile, outfile, input_format='jsonl', reverse=True)
+
+    first, second = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    assert first['results'][0]['formatted'] == '51.5,-0.1'
+    assert second['input'] == {'lat': 100, 'lng': 0}
+    assert 'Latitude' in second['error']
+
+
+@pytest.mark.asyncio
+async def test_reads_input_lazily(mock_api):
+    domain = await mock_api(_echo_handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+    consumed = 0
+
+    class CountingInput(io.StringIO):
+        def __next__(self):
+            nonlocal consumed
+            consumed += 1
+            return super().__next__()
+
+    class StopAfterFirstRow(io.StringIO):
+        def write(self, text):
+            raise RuntimeError('stop')
+
+    with pytest.raises(RuntimeError):
+        await run(geocoder, CountingInput('row\n' * 1000), StopAfterFirstRow(), concurrency=2)
+
+    assert consumed < 20
+
+
+@pytest.mark.asyncio
+async def test_fatal_error_stops_run(mock_api):
+    async def handler(request):
+        return web.json_response({}, status=401)
+
+    domain = await mock_api(handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+
+    with pytest.raises(NotAuthorizedError):
+        await run(geocoder, io.StringIO('a\nb\n'), io.StringIO())
+
+
+@pytest.mark.asyncio
+async def test_exhausted_quota_stops_run(mock_api):
+    async def handler(request):
+        return web.json_response({'status': {'code': 402}}, status=402)
+
+    domain = await mock_api(handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+
+    with pytest.raises(RateLimitExceededError) as excinfo:
+        await run(geocoder, io.StringIO('a\nb\n'), io.StringIO())
+    assert excinfo.value.status == 402
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_with_several_domains_is_waited_out(mock_api):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.query['q'])
+        if len(calls) == 1:
+            return web.json_response({'status': {'code': 429}}, status=429, headers={'Retry-After': '1'})
+        if len(calls) == 2:
+            # retried straight away, while the key is still left out for the 429
+            await asyncio.sleep(0.1)
+            return web.json_response({'status': {'code': 500}}, status=500, headers={'Retry-After': '0'})
+        return await _echo_handler(request)
+
+    domains = [await mock_api(handler), await mock_api(handler)]
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domains)
+    outfile = io.StringIO()
+
+    await run(geocoder, io.StringIO('a\nb\nc\n'), outfile, concurrency=2, output_columns=['formatted'])
+
+    assert outfile.getvalue().splitlines() == ['a,a', 'b,b', 'c,c']
+
+
+@pytest.mark.asyncio
+async def test_rows_wait_for_open_circuit(mock_api):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.query['q'])
+        if len(calls) == 1:
+            return web.json_response({'status': {'code': 500}}, status=500)
+        return await _echo_handler(request)
+
+    domain = await mock_api(handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain,
+                               circuit_breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0.2))
+    outfile = io.StringIO()
+
+    await run(geocoder, io.StringIO('a\nb\nc\n'), outfile, concurrency=1, output_columns=['formatted'])
+
+    # the row that opened the breaker failed, the others waited for it to close
+    assert outfile.getvalue().splitlines()[1:] == ['b,b', 'c,c']
+    assert calls == ['a', 'b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_resume_from_checkpoint(mock_api, tmp_path):
+    requested = []
+    fail_on = {'row7'}
+
+    async def handler(request):
+        query = request.query['q']
+        if query in fail_on:
+            return web.json_response({}, status=401)
+        requested.append(query)
+        return web.json_response({'results': [{'formatted': query, 'geometry': {'lat': 1, 'lng': 2}}]})
+
+    domain = await mock_api(handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+    input_text = 'address\n' + ''.join(f'row{i}\n' for i in range(10))
+    journal = str(tmp_path / 'journal.jsonl')
+    output = tmp_path / 'out.csv'
+
+    checkpoint = Checkpoint(journal, interval=3)
+    with open(output, 'a', newline='', encoding='utf-8') as outfile:
+        with pytest.raises(NotAuthorizedError):
+            await run(geocoder, io.StringIO(input_text), outfile, headers=True, concurrency=1,
+                      checkpoint=checkpoint)
+    checkpoint.close()
+
+    # simulate output written after the last checkpoint
+    with open(output, 'a', encoding='utf-8') as outfile:
+        outfile.write('partial')
+
+    assert 'row6' in requested
+
+    fail_on.clear()
+    requested.clear()
+    checkpoint = Checkpoint(journal, interval=3)
+    assert checkpoint.rows == 6
+    assert 6 in checkpoint.completed
+    done = {f'row{i}' for i in range(6)} | {f'row{i}' for i in checkpoint.completed}
+
+    with open(output, 'a', newline='', encoding='utf-8') as outfile:
+        await run(geocoder, io.StringIO(input_text), outfile, headers=True, concurrency=1,
+                  checkpoint=checkpoint)
+    checkpoint.close()
+
+    # nothing that succeeded before is requested again
+    assert 'row7' in requested
+    assert not done & set(requested)
+    assert done | set(requested) == {f'row{i}' for i in range(10)}
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'address,lat,lng,formatted'
+    assert lines[1:] == [f'row{i},1.0,2.0,row{i}' for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_resume_after_two_interruptions_with_torn_journal(mock_api, tmp_path):
+    requested = []
+    fail_on = set()
+
+    async def handler(request):
+        query = request.query['q']
+        if query in fail_on:
+            return web.json_response({}, status=401)
+        requested.append(query)
+        return web.json_response({'results': [{'formatted': query, 'geometry': {'lat': 1, 'lng': 2}}]})
+
+    domain = await mock_api(handler)
+    geocoder = OpenCageGeocode('abcde', protocol='http', domain=domain)
+    input_text = ''.join(f'row{i}\n' for i in range(12))
+    journal = tmp_path / 'journal.jsonl'
+    output = tmp_path / 'out.csv'
+
+    async def interrupted_run(fail):
+        fail_on.clear()
+        fail_on.update(fail)
+        checkpoint = Checkpoint(str(journal), interval=3)
+        with open(output, 'a', newline='', encoding='utf-8') as outfile:
+            if fail:
+                with pytest.raises(NotAuthorizedError):
+                    await run(geocoder, io.StringIO(input_text), outfile, concurrency=1, checkpoint=checkpoint)
+            else:
+                await run(geocoder, io.StringIO(input_text), outfile, concurrency=1, checkpoint=checkpoint)
+        checkpoint.close()
+        # killed while writing the journal
+        with open(journal, 'a', encoding='utf-8') as file:
+            file.write('{"row": 99, "resu')
+
+    await interrupted_run({'row4'})
+    assert Checkpoint(str(journal)).rows == 3
+
+    await interrupted_run({'row8'})
+    checkpoint = Checkpoint(str(journal))
+    # the torn line left by the first run doesn't hide the second run's progress
+    assert checkpoint.rows == 6
+    assert 7 in checkpoint.completed
+    done = {f'row{i}' for i in range(6)} | {f'row{i}' for i in checkpoint.completed}
+    checkpoint.close()
+
+    requested.clear()
+    await interrupted_run(set())
+
+    assert not done & set(requested)
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines == [f'row{i},1.0,2.0,row{i}' for i in range(12)]
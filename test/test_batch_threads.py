@@ -0,0 +1,80 @@
+# encoding: utf-8
+
+from pathlib import Path
+
+import os
+import threading
+
+import pytest
+import responses
+
+from opencage.geocoder import OpenCageGeocode, InvalidInputError, NotAuthorizedError
+
+# reduce maximum backoff retry time from 120s to 1s
+os.environ['BACKOFF_MAX_TIME'] = '1'
+
+geocoder = OpenCageGeocode('abcde')
+
+
+def _echo_query(request):
+    query = request.params['q']
+    body = '{"results": [{"formatted": "%s", "geometry": {"lat": "1.5", "lng": "2"}}]}' % query
+    return (200, {}, body)
+
+
+@responses.activate
+def test_geocode_many_in_input_order():
+    responses.add_callback(responses.GET, geocoder.url, callback=_echo_query)
+
+    queries = [str(i) for i in range(20)]
+    results = geocoder.geocode_many(queries, max_workers=4)
+
+    assert [r[0]['formatted'] for r in results] == queries
+    assert results[0][0]['geometry'] == {'lat': 1.5, 'lng': 2.0}
+
+
+@responses.activate
+def test_geocode_many_uses_worker_threads():
+    thread_names = set()
+
+    def callback(request):
+        thread_names.add(threading.current_thread().name)
+        return _echo_query(request)
+
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+
+    geocoder.geocode_many(['a'] * 10, max_workers=3)
+
+    assert threading.current_thread().name not in thread_names
+    assert 1 <= len(thread_names) <= 3
+
+
+@responses.activate
+def test_geocode_many_return_exceptions():
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/401_not_authorized.json').read_text(encoding="utf-8"),
+        status=401,
+    )
+
+    results = geocoder.geocode_many(['a', 'b'], return_exceptions=True)
+    assert all(isinstance(r, NotAuthorizedError) for r in results)
+
+    with pytest.raises(NotAuthorizedError):
+        geocoder.geocode_many(['a', 'b'])
+
+
+@responses.activate
+def test_reverse_geocode_many():
+    responses.add_callback(responses.GET, geocoder.url, callback=_echo_query)
+
+    results = geocoder.reverse_geocode_many([(51.5104, -0.1021), (100, 0)], return_exceptions=True)
+
+    assert results[0][0]['formatted'] == '51.5104,-0.1021'
+    assert isinstance(results[1], InvalidInputError)
+
+
+def test_invalid_max_workers():
+    with pytest.raises(ValueError):
+        geocoder.geocode_many(['a'], max_workers=0)
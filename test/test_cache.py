@@ -0,0 +1,199 @@
+# encoding: utf-8
+
+from pathlib import Path
+
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.cache import MemoryCache, SQLiteCache, cache_key
+from opencage.geocoder import OpenCageGeocode, NotAuthorizedError
+
+
+def test_cache_key_ignores_api_key_and_order():
+    assert cache_key({'q': 'London', 'key': 'a', 'language': 'de'}) == \
+        cache_key({'language': 'de', 'key': 'b', 'q': 'London'})
+    assert cache_key({'q': 'London'}) != cache_key({'q': 'Paris'})
+
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_memory_cache_ttl():
+    cache = MemoryCache(ttl=0.01)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.02)
+    assert cache.get('a') is None
+
+
+def test_memory_cache_invalid_maxsize():
+    with pytest.raises(ValueError):
+        MemoryCache(maxsize=0)
+
+
+@responses.activate
+def test_sync_repeat_query_served_from_cache():
+    geocoder = OpenCageGeocode('abcde', cache=True)
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    first = geocoder.geocode("EC1M 5RF")
+    second = geocoder.geocode("EC1M 5RF")
+    geocoder.geocode("EC1M 5RF", language='de')
+
+    assert first == second
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_sync_errors_not_cached():
+    geocoder = OpenCageGeocode('abcde', cache=MemoryCache())
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/401_not_authorized.json').read_text(encoding="utf-8"),
+        status=401,
+    )
+
+    for _ in range(2):
+        with pytest.raises(NotAuthorizedError):
+            geocoder.geocode("whatever")
+
+    assert len(responses.calls) == 2
+    assert len(geocoder.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_async_repeat_query_served_from_cache(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.json_response({'results': [{'geometry': {'lat': '1', 'lng': '2'}}]})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain, cache=True) as geocoder:
+        first = await geocoder.geocode_async("somewhere")
+        second = await geocoder.geocode_async("somewhere")
+
+    assert first == second == [{'geometry': {'lat': 1.0, 'lng': 2.0}}]
+    assert calls == 1
+
+
+def test_sqlite_cache_roundtrip(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('q=London', {'results': [{'formatted': 'London'}]})
+
+    assert cache.get('q=London') == {'results': [{'formatted': 'London'}]}
+    assert cache.get('q=Paris') is None
+    cache.close()
+
+
+def test_sqlite_cache_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = SQLiteCache(path)
+    reader = SQLiteCache(path)
+    writer.set('q=London', {'results': []})
+
+    assert reader.get('q=London') == {'results': []}
+
+
+def test_sqlite_cache_ttl(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl=-1)
+    cache.set('q=London', {'results': []})
+
+    assert cache.get('q=London') is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), maxsize=2, prune_interval=1)
+    cache.set('a', 1)
+    time.sleep(0.01)
+    cache.set('b', 2)
+    time.sleep(0.01)
+    cache.get('a')
+    time.sleep(0.01)
+    cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+
+@responses.activate
+def test_sqlite_cache_with_geocoder(tmp_path):
+    geocoder = OpenCageGeocode('abcde', cache=SQLiteCache(str(tmp_path / 'cache.db')))
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    first = geocoder.geocode("EC1M 5RF")
+    second = geocoder.geocode("EC1M 5RF")
+
+    assert first == second
+    assert len(responses.calls) == 1
+
+
+def _accessed(path, key):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT accessed FROM responses WHERE key = ?', (SQLiteCache._hash(key),)).fetchone()[0]
+
+
+def test_sqlite_cache_saves_access_times_in_batches(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = SQLiteCache(path, touch_interval=2)
+    cache.set('a', 1)
+    written = _accessed(path, 'a')
+
+    time.sleep(0.01)
+    cache.get('a')
+    assert _accessed(path, 'a') == written
+
+    cache.get('a')
+    assert _accessed(path, 'a') > written
+
+
+def _use_cache_in_child(cache, parent_connection_id, queue):
+    queue.put((id(cache._connection()) != parent_connection_id, cache.get('a')))
+    cache.set('b', 2)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_sqlite_cache_reconnects_after_fork(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('a', 1)
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    child = context.Process(target=_use_cache_in_child, args=(cache, id(cache._conn), queue))
+    child.start()
+    child.join(10)
+
+    assert child.exitcode == 0
+    assert queue.get(timeout=1) == (True, 1)
+    assert cache.get('b') == 2
@@ -0,0 +1,103 @@
+# encoding: utf-8
+
+import asyncio
+import threading
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode, NotAuthorizedError
+from opencage.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_single_flight_shares_call_between_threads():
+    group = SingleFlight()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'result'
+
+    threads = [threading.Thread(target=lambda: results.append(group.do('key', slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['result'] * 5
+    # finished calls are not kept
+    assert group.do('key', lambda: 'again') == 'again'
+
+
+def test_single_flight_shares_exception():
+    group = SingleFlight()
+
+    def failing():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        group.do('key', failing)
+
+
+@pytest.mark.asyncio
+async def test_async_single_flight_survives_cancelled_caller():
+    group = AsyncSingleFlight()
+    calls = 0
+
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    first = asyncio.ensure_future(group.do('key', slow))
+    second = asyncio.ensure_future(group.do('key', slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == 'result'
+    assert calls == 1
+
+
+@responses.activate
+def test_sync_identical_queries_share_request():
+    geocoder = OpenCageGeocode('abcde', coalesce=True)
+
+    def callback(request):
+        time.sleep(0.05)
+        return (200, {}, '{"results": [{"geometry": {"lat": "1", "lng": "2"}}]}')
+
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+
+    results = geocoder.geocode_many(['warehouse'] * 5 + ['other'], max_workers=6)
+
+    assert len(responses.calls) == 2
+    assert results[0] == [{'geometry': {'lat': 1.0, 'lng': 2.0}}]
+    # each caller gets its own copy of the results
+    assert results[0] is not results[1]
+
+
+@pytest.mark.asyncio
+async def test_async_identical_queries_share_request(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        if request.query['q'] == 'bad':
+            return web.json_response({}, status=401)
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain, coalesce=True) as geocoder:
+        results = await geocoder.geocode_batch_async(['warehouse'] * 5 + ['bad'] * 2, return_exceptions=True)
+
+    assert calls == 2
+    assert results[:5] == [[]] * 5
+    assert all(isinstance(r, NotAuthorizedError) for r in results[5:])
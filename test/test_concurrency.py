@@ -0,0 +1,190 @@
+# encoding: utf-8
+
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.batch import run
+from opencage.concurrency import AdaptiveConcurrency
+from opencage.geocoder import OpenCageGeocode
+
+# reduce maximum backoff retry time from 120s to 1s
+os.environ['BACKOFF_MAX_TIME'] = '1'
+
+BODY = json.dumps({'results': [{'formatted': 'x', 'geometry': {'lat': 1.5, 'lng': 2.0}}], 'status': {'code': 200}})
+
+
+def test_additive_increase():
+    limiter = AdaptiveConcurrency(initial=2, max_limit=4)
+    limiter.record(0.1)
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.record(0.1)
+    assert limiter.limit == 3
+
+    for _ in range(100):
+        limiter.record(0.1)
+    assert limiter.limit == 4
+
+
+def test_multiplicative_decrease_once_per_window():
+    limiter = AdaptiveConcurrency(initial=8, max_limit=8)
+    limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 4
+
+    # the other requests that were in flight with it don't cut again
+    for _ in range(3):
+        limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 4
+
+    limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 2
+
+    for _ in range(10):
+        limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 1
+
+
+def test_rising_latency_cuts_limit():
+    limiter = AdaptiveConcurrency(initial=8, max_limit=8, latency_tolerance=2.0)
+    limiter.record(0.1)
+    limiter.record(0.15)
+    assert limiter.limit == 8
+
+    limiter.record(0.5)
+    assert limiter.limit == 4
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        AdaptiveConcurrency(initial=10, max_limit=5)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrency(backoff_ratio=1)
+
+
+def _overloading_handler(capacity):
+    """Handler that slows down a lot once more than ``capacity`` requests are in flight."""
+    state = {'in_flight': 0}
+
+    async def handler(request):
+        state['in_flight'] += 1
+        try:
+            await asyncio.sleep(0.005 if state['in_flight'] <= capacity else 0.05)
+        finally:
+            state['in_flight'] -= 1
+        return web.Response(text=BODY, content_type='application/json')
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_batch_async_adapts(mock_api):
+    domain = await mock_api(_overloading_handler(capacity=3))
+    limiter = AdaptiveConcurrency(initial=1, max_limit=20)
+
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http') as geocoder:
+        results = await geocoder.geocode_batch_async(['x'] * 100, concurrency=limiter)
+
+    assert all(result[0]['formatted'] == 'x' for result in results)
+    assert limiter.limit < 10
+
+
+@pytest.mark.asyncio
+async def test_stream_async_adapts_to_errors(mock_api):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        if request.query['q'] == 'busy':
+            return web.json_response({'status': {'code': 429}}, status=429)
+        return web.Response(text=BODY, content_type='application/json')
+
+    domain = await mock_api(handler)
+    limiter = AdaptiveConcurrency(initial=8, max_limit=8)
+
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http') as geocoder:
+        results = [result async for _, result in geocoder.geocode_stream_async(['busy'] * 20, concurrency=limiter)]
+
+    assert len(results) == 20
+    assert limiter.limit == 1
+    assert peak <= 8
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_run_adapts(mock_api):
+    domain = await mock_api(_overloading_handler(capacity=3))
+    limiter = AdaptiveConcurrency(initial=1, max_limit=20)
+    geocoder = OpenCageGeocode('abcde', domain=domain, protocol='http')
+    outfile = io.StringIO()
+
+    count = await run(geocoder, io.StringIO('x\n' * 100), outfile, concurrency=limiter)
+
+    assert count == 100
+    assert outfile.getvalue().count('x,1.5,2.0') == 100
+    assert limiter.limit < 10
+
+
+@responses.activate
+def test_geocode_many_keeps_to_limit():
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def callback(request):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.005)
+        with lock:
+            in_flight -= 1
+        return (200, {}, BODY)
+
+    geocoder = OpenCageGeocode('abcde')
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+    # no cuts for latency, which varies too much on a busy test machine
+    limiter = AdaptiveConcurrency(initial=2, max_limit=3, latency_tolerance=1000)
+
+    results = geocoder.geocode_many(['x'] * 30, max_workers=limiter)
+
+    assert len(results) == 30
+    assert 1 <= peak <= 3
+    assert limiter.limit == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_run_waits_out_rate_limit(mock_api):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.query['q'])
+        if len(calls) <= 3:
+            return web.json_response({'status': {'code': 429}}, status=429, headers={'Retry-After': '0.2'})
+        return web.Response(text=BODY, content_type='application/json')
+
+    domain = await mock_api(handler)
+    limiter = AdaptiveConcurrency(initial=4, max_limit=4)
+    overloads = []
+    record = limiter.record
+    limiter.record = lambda latency, overloaded=False: (overloads.append(overloaded), record(latency, overloaded))
+    geocoder = OpenCageGeocode('abcde', domain=domain, protocol='http')
+    outfile = io.StringIO()
+
+    count = await run(geocoder, io.StringIO('x\n' * 20), outfile, concurrency=limiter)
+
+    assert count == 20
+    assert outfile.getvalue().count('x,1.5,2.0') == 20
+    assert len(calls) == 23
+    assert overloads.count(True) == 3
@@ -0,0 +1,67 @@
+# encoding: utf-8
+
+import json
+from pathlib import Path
+
+import pytest
+import responses
+
+from opencage.decoder import get_decoder
+from opencage.geocoder import OpenCageGeocode, UnknownError
+
+URL = 'https://api.opencagedata.com/geocode/v1/json'
+BODY = Path('test/fixtures/muenster.json').read_text(encoding='utf-8')
+
+
+def test_stdlib_decoder():
+    loads = get_decoder('json')
+    assert loads(b'{"lat": 51.9526}') == {'lat': 51.9526}
+    with pytest.raises(ValueError):
+        loads(b'not json')
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError):
+        get_decoder('simplejson')
+
+
+@pytest.mark.parametrize('name', ['orjson', 'msgspec'])
+def test_optional_decoders(name):
+    pytest.importorskip(name)
+    loads = get_decoder(name)
+    assert loads(BODY.encode('utf-8')) == json.loads(BODY)
+    with pytest.raises(ValueError):
+        loads(b'not json')
+
+
+def test_default_decoder_is_available():
+    assert get_decoder()(b'[1, 2.5]') == [1, 2.5]
+
+
+@responses.activate
+@pytest.mark.parametrize('name', ['json', 'orjson'])
+def test_geocoder_decodes_with_backend(name):
+    pytest.importorskip(name)
+    responses.add(responses.GET, URL, body=BODY, status=200)
+    geocoder = OpenCageGeocode('abcde', json_decoder=name)
+
+    results = geocoder.geocode('Münster')
+
+    assert results[0]['geometry'] == {'lat': 51.9625101, 'lng': 7.6251879}
+    assert results[0]['components']['city'] == 'Münster'
+
+
+@responses.activate
+def test_geocoder_custom_decoder_and_invalid_json():
+    responses.add(responses.GET, URL, body='<html>oops</html>', status=200)
+    bodies = []
+
+    def loads(body):
+        bodies.append(body)
+        return json.loads(body)
+
+    geocoder = OpenCageGeocode('abcde', json_decoder=loads)
+    with pytest.raises(UnknownError):
+        geocoder.geocode('Münster')
+
+    assert bodies[0] == b'<html>oops</html>'
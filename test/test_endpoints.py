@@ -0,0 +1,171 @@
+# encoding: utf-8
+
+import json
+import os
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.endpoints import EndpointPool
+from opencage.geocoder import OpenCageGeocode, ForbiddenError, RateLimitExceededError
+
+# reduce maximum backoff retry time from 120s to 1s
+os.environ['BACKOFF_MAX_TIME'] = '1'
+
+BODY = json.dumps({'results': [{'geometry': {'lat': 1.5, 'lng': 2.0}}], 'status': {'code': 200}})
+
+
+def _body_for(code):
+    return json.dumps({'results': [], 'status': {'code': code}})
+
+
+def test_keys_used_in_turn():
+    pool = EndpointPool(['a', 'b'], ['url'])
+    assert [pool.choose()[0] for _ in range(4)] == ['a', 'b', 'a', 'b']
+
+
+def test_key_out_of_quota_left_out_until_reset():
+    pool = EndpointPool(['a', 'b'], ['url'])
+    reset = time.time() + 3600
+
+    assert pool.key_failed('a', reset=reset)
+    assert {pool.choose()[0] for _ in range(3)} == {'b'}
+
+    assert not pool.key_failed('b', reset=reset + 60)
+    assert pool.choose() is None
+    assert pool.quota_reset() == reset
+    assert not pool.all_keys_rejected()
+
+
+def test_reason_keys_are_left_out_for():
+    pool = EndpointPool(['a', 'b'], ['url'])
+    pool.key_failed('a', reset=time.time() + 1, status=429)
+    pool.succeeded('b', 'url', 0.1, {'rate': {'remaining': 0, 'reset': time.time() + 3600}})
+    assert pool.choose() is None
+    assert pool.quota_status() == 429
+
+    pool = EndpointPool(['a'], ['url'])
+    pool.key_failed('a', reset=time.time() + 3600, status=402)
+    assert pool.quota_status() == 402
+
+
+def test_rejected_keys():
+    pool = EndpointPool(['a'], ['url'])
+    pool.key_failed('a', rejected=True)
+    assert pool.choose() is None
+    assert pool.all_keys_rejected()
+
+
+def test_key_left_out_when_response_shows_quota_used_up():
+    pool = EndpointPool(['a', 'b'], ['url'])
+    pool.succeeded('a', 'url', 0.1, {'rate': {'remaining': 0, 'reset': time.time() + 60}})
+    assert {pool.choose()[0] for _ in range(3)} == {'b'}
+
+
+def test_failing_url_left_out():
+    pool = EndpointPool(['a'], ['bad', 'good'], max_failures=2)
+    pool.url_failed('bad')
+    pool.url_failed('bad')
+    assert {pool.choose()[1] for _ in range(20)} == {'good'}
+
+    # with every URL left out, the one due back first is still used
+    pool.url_failed('good')
+    pool.url_failed('good')
+    assert pool.choose()[1] == 'bad'
+
+
+def test_faster_url_gets_more_requests():
+    random.seed(0)
+    pool = EndpointPool(['a'], ['slow', 'fast'])
+    pool.succeeded('a', 'slow', 0.5)
+    pool.succeeded('a', 'fast', 0.05)
+    urls = [pool.choose()[1] for _ in range(1000)]
+    assert urls.count('fast') > 800
+
+
+def test_every_domain_is_validated():
+    with pytest.raises(ValueError):
+        OpenCageGeocode('abcde', domain=['api.opencagedata.com', 'example.com'])
+
+
+@responses.activate
+def test_sync_fails_over_to_next_key():
+    geocoder = OpenCageGeocode(['spent', 'fresh'])
+    keys_used = []
+
+    def callback(request):
+        key = parse_qs(urlsplit(request.url).query)['key'][0]
+        keys_used.append(key)
+        if key == 'spent':
+            return (402, {}, _body_for(402))
+        return (200, {}, BODY)
+
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+
+    assert geocoder.geocode('one')[0]['geometry'] == {'lat': 1.5, 'lng': 2.0}
+    geocoder.geocode('two')
+
+    assert keys_used == ['spent', 'fresh', 'fresh']
+
+
+@responses.activate
+def test_sync_all_keys_refused():
+    geocoder = OpenCageGeocode(['a', 'b'])
+    responses.add(responses.GET, geocoder.url, body=_body_for(403), status=403)
+
+    with pytest.raises(ForbiddenError):
+        geocoder.geocode('one')
+    with pytest.raises(ForbiddenError):
+        geocoder.geocode('two')
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_sync_fails_over_to_next_domain():
+    geocoder = OpenCageGeocode('abcde', domain=['a.opencagedata.com', 'b.opencagedata.com'])
+    geocoder.endpoints = EndpointPool(['abcde'], geocoder.endpoints.urls, max_failures=1)
+    responses.add(responses.GET, 'https://a.opencagedata.com/geocode/v1/json', body='oops', status=500)
+    responses.add(responses.GET, 'https://b.opencagedata.com/geocode/v1/json', body=BODY, status=200)
+
+    for _ in range(3):
+        assert geocoder.geocode('one')
+
+    hosts = [urlsplit(call.request.url).hostname for call in responses.calls]
+    assert hosts.count('a.opencagedata.com') <= 1
+    assert hosts[-1] == 'b.opencagedata.com'
+
+
+@pytest.mark.asyncio
+async def test_async_fails_over_to_next_key(mock_api):
+    keys_used = []
+
+    async def handler(request):
+        keys_used.append(request.query['key'])
+        if request.query['key'] == 'spent':
+            return web.json_response({'status': {'code': 429}}, status=429)
+        return web.Response(text=BODY, content_type='application/json')
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode(['spent', 'fresh'], domain=domain, protocol='http') as geocoder:
+        await geocoder.geocode_async('one')
+        await geocoder.geocode_async('two')
+
+    assert keys_used == ['spent', 'fresh', 'fresh']
+
+
+@pytest.mark.asyncio
+async def test_async_all_keys_out_of_quota(mock_api):
+    async def handler(request):
+        return web.json_response({'rate': {'limit': 2500, 'remaining': 0, 'reset': 4102444800},
+                                  'status': {'code': 402}}, status=402)
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode(['a', 'b'], domain=domain, protocol='http') as geocoder:
+        with pytest.raises(RateLimitExceededError) as excinfo:
+            await geocoder.geocode_async('one')
+
+    assert excinfo.value.reset == 4102444800
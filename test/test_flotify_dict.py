@@ -1,4 +1,8 @@
-from opencage.geocoder import floatify_latlng
+from pathlib import Path
+
+import json
+
+from opencage.geocoder import floatify_latlng, floatify_results
 
 
 def test_string():
@@ -29,3 +33,35 @@ def dict_with_list():
 
 def list_with_things():
     assert floatify_latlng([{'foo': 'bar'}]) == [{'foo': 'bar'}]
+
+
+def test_results_converts_geometry_and_bounds():
+    results = [{
+        'geometry': {'lat': '12.01', 'lng': '-0.9'},
+        'bounds': {'northeast': {'lat': '13', 'lng': '1'}, 'southwest': {'lat': '11', 'lng': '-1'}},
+        'components': {'city': 'X'},
+    }]
+    converted = floatify_results(results)
+
+    assert converted == [{
+        'geometry': {'lat': 12.01, 'lng': -0.9},
+        'bounds': {'northeast': {'lat': 13.0, 'lng': 1.0}, 'southwest': {'lat': 11.0, 'lng': -1.0}},
+        'components': {'city': 'X'},
+    }]
+    # input left alone, untouched parts shared
+    assert results[0]['geometry'] == {'lat': '12.01', 'lng': '-0.9'}
+    assert results[0]['bounds']['northeast'] == {'lat': '13', 'lng': '1'}
+    assert converted[0]['components'] is results[0]['components']
+
+
+def test_results_in_place():
+    results = [{'geometry': {'lat': '12.01', 'lng': '-0.9'}}, {'formatted': 'no geometry'}]
+
+    assert floatify_results(results, in_place=True) is results
+    assert results == [{'geometry': {'lat': 12.01, 'lng': -0.9}}, {'formatted': 'no geometry'}]
+
+
+def test_results_same_as_floatify_latlng():
+    for fixture in ('uk_postcode.json', 'muenster.json', 'donostia.json'):
+        results = json.loads(Path('test/fixtures', fixture).read_text(encoding="utf-8"))['results']
+        assert floatify_results(results) == floatify_latlng(results)
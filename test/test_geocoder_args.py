@@ -1,8 +1,11 @@
 # encoding: utf-8
 
 import os
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
+import responses
 
 from opencage.geocoder import OpenCageGeocode
 
@@ -55,3 +58,20 @@ def test_custom_domain_with_port_preserved():
     """Valid subdomain with explicit port still works after validation."""
     geocoder = OpenCageGeocode('abcde', domain='api2.opencagedata.com:8443')
     assert geocoder.url == 'https://api2.opencagedata.com:8443/geocode/v1/json'
+
+
+@responses.activate
+def test_default_params():
+    """Test that instance default params are sent and can be overridden per call"""
+    responses.add(responses.GET, 'https://api.opencagedata.com/geocode/v1/json',
+                  body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"), status=200)
+    geocoder = OpenCageGeocode('abcde', default_params={'no_annotations': 1, 'limit': 1})
+
+    geocoder.geocode('EC1M 5RF')
+    geocoder.geocode('EC1M 5RF', limit=5, no_annotations=None)
+
+    first, second = (parse_qs(urlsplit(call.request.url).query) for call in responses.calls)
+    assert first['no_annotations'] == ['1']
+    assert first['limit'] == ['1']
+    assert 'no_annotations' not in second
+    assert second['limit'] == ['5']
@@ -4,7 +4,12 @@ from pathlib import Path
 
 import os
 import re
+import subprocess
+import sys
+
+import pytest
 import responses
+from aiohttp import web
 
 from opencage.geocoder import OpenCageGeocode
 
@@ -55,3 +60,72 @@ def test_user_agent_comment_crlf_stripped():
     assert '\r' not in user_agent
     assert '\n' not in user_agent
     assert 'Injected-Header' in user_agent  # still present, just on the same line
+
+
+def test_headers_built_once_until_comment_changes():
+    geocoder_cached = OpenCageGeocode('abcde', user_agent_comment='first')
+
+    headers = geocoder_cached._opencage_headers('requests')
+    assert geocoder_cached._opencage_headers('requests') is headers
+    assert headers['User-Agent'].endswith('(first)')
+
+    geocoder_cached.user_agent_comment = 'second'
+    assert geocoder_cached._opencage_headers('requests')['User-Agent'].endswith('(second)')
+
+
+@pytest.mark.asyncio
+async def test_async(mock_api):
+    user_agents = []
+
+    async def handler(request):
+        user_agents.append(request.headers['User-Agent'])
+        return web.Response(text=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+                            content_type='application/json')
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http',
+                               user_agent_comment='OpenCage Test') as geocoder_async:
+        await geocoder_async.geocode_async("EC1M 5RF")
+
+    assert user_agent_format.match(user_agents[0]) is not None
+    assert ' aiohttp/' in user_agents[0]
+
+
+def test_aiohttp_not_imported_for_sync_use():
+    code = "import sys, opencage.geocoder; print('aiohttp' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent.parent).stdout
+    assert output.strip() == 'False'
+
+
+@responses.activate
+def test_accept_encoding():
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    geocoder.geocode("EC1M 5RF")
+
+    assert 'gzip' in responses.calls[-1].request.headers['Accept-Encoding']
+
+
+@pytest.mark.asyncio
+async def test_async_compressed_response(mock_api):
+    accept_encodings = []
+
+    async def handler(request):
+        accept_encodings.append(request.headers['Accept-Encoding'])
+        response = web.Response(text=Path('test/fixtures/muenster.json').read_text(encoding="utf-8"),
+                                content_type='application/json')
+        response.enable_compression()
+        return response
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http') as geocoder_async:
+        results = await geocoder_async.geocode_async("Münster")
+
+    assert 'gzip' in accept_encodings[0]
+    assert results[0]['components']['city'] == 'Münster'
@@ -0,0 +1,139 @@
+# encoding: utf-8
+
+import asyncio
+import json
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode
+from opencage.hedging import HedgePolicy
+from opencage.ratelimit import RateLimiter
+
+BODY = json.dumps({'results': [{'formatted': 'x', 'geometry': {'lat': 1.5, 'lng': 2.0}}], 'status': {'code': 200}})
+
+
+def _warmed_up_policy(latency=0.01, **kwargs):
+    policy = HedgePolicy(min_samples=1, min_delay=0, **kwargs)
+    policy.record(latency)
+    return policy
+
+
+def test_no_hedging_before_enough_samples():
+    policy = HedgePolicy(min_samples=3)
+    policy.record(0.1)
+    policy.record(0.1)
+    assert policy.delay() is None
+    policy.record(0.1)
+    assert policy.delay() == 0.1
+
+
+def test_delay_is_percentile_of_latencies():
+    policy = HedgePolicy(percentile=90, min_delay=0, min_samples=1)
+    for latency in range(1, 101):
+        policy.record(latency / 100)
+    assert policy.delay() == 0.9
+
+    policy.max_delay = 0.5
+    assert policy.delay() == 0.5
+
+
+def test_share_of_hedged_requests_is_limited():
+    policy = HedgePolicy(max_ratio=0.5, window=2, min_samples=1)
+    assert policy.allow()
+    assert not policy.allow()
+
+    policy.delay()
+    assert not policy.allow()
+    policy.delay()
+    assert policy.allow()
+
+
+def test_rate_limiter_available():
+    limiter = RateLimiter(rate=0.001)
+    assert limiter.available()
+    assert limiter.acquire()
+    assert not limiter.available()
+
+    limiter = RateLimiter()
+    limiter.update({'rate': {'limit': 2500, 'remaining': 0, 'reset': time.time() + 60}})
+    assert not limiter.available()
+
+
+def _slow_first_handler(delay):
+    """Handler answering its first request after ``delay`` seconds and the others right away."""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(delay)
+        return web.Response(text=BODY, content_type='application/json')
+
+    return handler, calls
+
+
+@pytest.mark.asyncio
+async def test_async_slow_request_is_hedged(mock_api):
+    handler, calls = _slow_first_handler(2)
+    domain = await mock_api(handler)
+    requests_seen = []
+
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http', hedge=_warmed_up_policy(),
+                               observer=requests_seen.append) as geocoder:
+        start = time.perf_counter()
+        results = await geocoder.geocode_async('x')
+        elapsed = time.perf_counter() - start
+
+    assert results[0]['formatted'] == 'x'
+    assert elapsed < 1
+    assert len(calls) == 2
+    assert requests_seen[0].hedged
+    assert requests_seen[0].tries == 2
+    assert requests_seen[0].retries == 0
+
+
+@pytest.mark.asyncio
+async def test_async_fast_request_is_not_hedged(mock_api):
+    handler, calls = _slow_first_handler(0)
+    domain = await mock_api(handler)
+
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http',
+                               hedge=_warmed_up_policy(latency=1)) as geocoder:
+        await geocoder.geocode_async('x')
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_holds_back_hedge(mock_api):
+    handler, calls = _slow_first_handler(0.2)
+    domain = await mock_api(handler)
+
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http', hedge=_warmed_up_policy(),
+                               rate_limit=RateLimiter(rate=0.001)) as geocoder:
+        await geocoder.geocode_async('x')
+
+    assert len(calls) == 1
+
+
+@responses.activate
+def test_sync_requests_are_not_hedged():
+    calls = []
+
+    def callback(request):
+        calls.append(request)
+        time.sleep(0.2)
+        return (200, {}, BODY)
+
+    requests_seen = []
+    geocoder = OpenCageGeocode('abcde', hedge=_warmed_up_policy(), observer=requests_seen.append)
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+
+    results = geocoder.geocode('x')
+
+    assert results[0]['formatted'] == 'x'
+    assert len(calls) == 1
+    assert not requests_seen[0].hedged
@@ -0,0 +1,144 @@
+# encoding: utf-8
+
+import json
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.cache import MemoryCache
+from opencage.geocoder import OpenCageGeocode, NotAuthorizedError
+from opencage.instrumentation import Observer, RequestInfo
+
+URL = 'https://api.opencagedata.com/geocode/v1/json'
+BODY = json.dumps({
+    'rate': {'limit': 2500, 'remaining': 2499, 'reset': 1402185600},
+    'results': [{'geometry': {'lat': '51.9526', 'lng': '7.6324'}, 'formatted': 'Münster, Germany'}],
+    'status': {'code': 200, 'message': 'OK'},
+})
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.requests = []
+
+    def on_request(self, info):
+        self.requests.append(info)
+
+
+@responses.activate
+def test_observer_object():
+    responses.add(responses.GET, URL, body=BODY, status=200)
+    recorder = Recorder()
+    geocoder = OpenCageGeocode('abcde', observer=recorder)
+
+    geocoder.geocode('Münster')
+
+    (info,) = recorder.requests
+    assert info.params['q'] == 'Münster'
+    assert 'key' not in info.params
+    assert info.status == 200
+    assert info.tries == 1
+    assert info.retries == 0
+    assert info.bytes == len(BODY.encode('utf-8'))
+    assert info.remaining == 2499
+    assert info.latency > 0
+    assert info.error is None
+    assert not info.cache_hit
+
+
+@responses.activate
+def test_observer_callable_and_cache_hit():
+    responses.add(responses.GET, URL, body=BODY, status=200)
+    infos = []
+    geocoder = OpenCageGeocode('abcde', cache=MemoryCache(), observer=infos.append)
+
+    geocoder.geocode('Münster')
+    geocoder.geocode('Münster')
+
+    assert len(responses.calls) == 1
+    assert [info.cache_hit for info in infos] == [False, True]
+    assert infos[1].tries == 0
+
+
+@responses.activate
+def test_observer_counts_retries():
+    responses.add(responses.GET, URL, body='not json', status=500)
+    responses.add(responses.GET, URL, body=BODY, status=200)
+    infos = []
+    geocoder = OpenCageGeocode('abcde', observer=infos.append)
+
+    geocoder.geocode('Münster')
+
+    (info,) = infos
+    assert info.tries == 2
+    assert info.retries == 1
+    assert info.status == 200
+
+
+@responses.activate
+def test_observer_records_error():
+    responses.add(responses.GET, URL, body=json.dumps({'status': {'code': 401, 'message': 'invalid API key'}}),
+                  status=401)
+    infos = []
+    geocoder = OpenCageGeocode('abcde', observer=infos.append)
+
+    with pytest.raises(NotAuthorizedError):
+        geocoder.geocode('Münster')
+
+    (info,) = infos
+    assert info.status == 401
+    assert isinstance(info.error, NotAuthorizedError)
+
+
+def _broken_observer(info):
+    raise KeyError('oops')
+
+
+@responses.activate
+def test_observer_errors_are_logged_not_raised(caplog):
+    responses.add(responses.GET, URL, body=BODY, status=200)
+    responses.add(responses.GET, URL, body=json.dumps({'status': {'code': 401}}), status=401)
+    geocoder = OpenCageGeocode('abcde', observer=_broken_observer)
+
+    assert geocoder.geocode('Münster')[0]['formatted'] == 'Münster, Germany'
+    # the API error isn't replaced by the observer's
+    with pytest.raises(NotAuthorizedError):
+        geocoder.geocode('Münster')
+
+    assert len([record for record in caplog.records if 'observer' in record.getMessage()]) == 2
+
+
+@pytest.mark.asyncio
+async def test_observer_async(mock_api):
+    async def handler(request):
+        return web.Response(text=BODY, content_type='application/json')
+
+    domain = await mock_api(handler)
+    infos = []
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http', observer=infos.append) as geocoder:
+        results = await geocoder.geocode_async('Münster')
+
+    assert results[0]['geometry']['lat'] == 51.9526
+    (info,) = infos
+    assert info.status == 200
+    assert info.tries == 1
+    assert info.bytes == len(BODY.encode('utf-8'))
+    assert info.remaining == 2499
+
+
+def test_prometheus_observer():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from opencage.instrumentation import PrometheusObserver
+
+    registry = prometheus_client.CollectorRegistry()
+    observer = PrometheusObserver(registry=registry)
+    info = RequestInfo({'q': 'Münster'}, 0)
+    info.status = 200
+    info.tries = 3
+    info.remaining = 10
+    observer.on_request(info)
+
+    assert registry.get_sample_value('opencage_requests_total', {'status': '200', 'cache': 'miss'}) == 1
+    assert registry.get_sample_value('opencage_retries_total') == 2
+    assert registry.get_sample_value('opencage_quota_remaining') == 10
@@ -0,0 +1,113 @@
+# encoding: utf-8
+
+import json
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode, RateLimitExceededError
+from opencage.ratelimit import RateLimiter
+
+
+def _body(remaining, reset=None):
+    reset = int(time.time()) + 3600 if reset is None else reset
+    return json.dumps({'rate': {'limit': 2500, 'remaining': remaining, 'reset': reset}, 'results': []})
+
+
+def test_paces_requests():
+    limiter = RateLimiter(rate=100)
+    start = time.monotonic()
+    for _ in range(6):
+        assert limiter.acquire()
+    # first request goes out straight away, the other five 10ms apart
+    assert time.monotonic() - start >= 0.045
+
+
+def test_burst_is_not_paced():
+    limiter = RateLimiter(rate=1, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_async_pacing():
+    limiter = RateLimiter(rate=100)
+    start = time.monotonic()
+    for _ in range(6):
+        assert await limiter.acquire_async()
+    assert time.monotonic() - start >= 0.045
+
+
+def test_update_from_headers():
+    limiter = RateLimiter()
+    limiter.update({'results': []}, {'X-RateLimit-Limit': '2500', 'X-RateLimit-Remaining': '0',
+                                     'X-RateLimit-Reset': str(int(time.time()) + 60)})
+    assert limiter.limit == 2500
+    assert limiter.remaining == 0
+    assert not limiter.acquire()
+
+
+def test_quota_renewed_after_reset():
+    limiter = RateLimiter()
+    limiter.update({'rate': {'limit': 2500, 'remaining': 0, 'reset': int(time.time()) - 1}})
+    assert limiter.acquire()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+    with pytest.raises(ValueError):
+        RateLimiter(rate=1, burst=0)
+
+
+@responses.activate
+def test_sync_stops_when_quota_used_up():
+    geocoder = OpenCageGeocode('abcde', rate_limit=RateLimiter())
+    remaining = [2]
+
+    def callback(request):
+        remaining[0] -= 1
+        return (200, {}, _body(remaining=remaining[0]))
+
+    responses.add_callback(responses.GET, geocoder.url, callback=callback)
+
+    geocoder.geocode('first')
+    geocoder.geocode('second')
+    with pytest.raises(RateLimitExceededError):
+        geocoder.geocode('third')
+
+    assert geocoder.rate_limiter.remaining == 0
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_sync_rate_limit_from_number():
+    geocoder = OpenCageGeocode('abcde', rate_limit=50)
+    responses.add(responses.GET, geocoder.url, body=_body(remaining=100), status=200)
+
+    start = time.monotonic()
+    for _ in range(4):
+        geocoder.geocode('somewhere')
+    assert time.monotonic() - start >= 0.055
+
+
+@pytest.mark.asyncio
+async def test_async_stops_after_402(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.Response(body=_body(remaining=0), status=402, content_type='application/json')
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain, rate_limit=RateLimiter()) as geocoder:
+        for _ in range(2):
+            with pytest.raises(RateLimitExceededError):
+                await geocoder.geocode_async('somewhere')
+
+    assert calls == 1
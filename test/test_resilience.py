@@ -0,0 +1,157 @@
+# encoding: utf-8
+
+import os
+import time
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.geocoder import (
+    OpenCageGeocode, CircuitOpenError, NotAuthorizedError, RateLimitExceededError, UnknownError,
+)
+from opencage.ratelimit import RateLimiter
+from opencage.resilience import CircuitBreaker, RetryBudget
+
+# reduce maximum backoff retry time from 120s to 1s
+os.environ['BACKOFF_MAX_TIME'] = '1'
+
+URL = 'https://api.opencagedata.com/geocode/v1/json'
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert 59 < breaker.retry_after() <= 60
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # trial failed: open again
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+@responses.activate
+def test_open_breaker_fails_fast():
+    responses.add(responses.GET, URL, body='oops', status=500)
+    geocoder = OpenCageGeocode('abcde', circuit_breaker=CircuitBreaker(failure_threshold=2))
+
+    with pytest.raises(UnknownError) as excinfo:
+        geocoder.geocode('one')
+    # retries stopped once the breaker opened
+    assert len(responses.calls) == 2
+    assert not isinstance(excinfo.value, CircuitOpenError)
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        geocoder.geocode('two')
+    assert len(responses.calls) == 2
+    assert excinfo.value.retry_after > 0
+
+
+@responses.activate
+def test_client_errors_do_not_open_breaker():
+    responses.add(responses.GET, URL, body='{"status": {"code": 401}}', status=401)
+    geocoder = OpenCageGeocode('abcde', circuit_breaker=CircuitBreaker(failure_threshold=1))
+
+    for _ in range(2):
+        with pytest.raises(NotAuthorizedError):
+            geocoder.geocode('one')
+    assert geocoder.circuit_breaker.state == 'closed'
+
+
+@responses.activate
+def test_errors_without_response_do_not_close_breaker():
+    responses.add(responses.GET, URL, body='oops', status=500)
+    geocoder = OpenCageGeocode('abcde', rate_limit=RateLimiter(),
+                               circuit_breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0.05))
+
+    with pytest.raises(UnknownError):
+        geocoder.geocode('one')
+    time.sleep(0.06)
+
+    # the trial request is held back by the rate limiter, so the API never answered
+    geocoder.rate_limiter.update({'rate': {'limit': 2500, 'remaining': 0, 'reset': time.time() + 3600}})
+    with pytest.raises(RateLimitExceededError):
+        geocoder.geocode('two')
+    assert len(responses.calls) == 1
+    assert geocoder.circuit_breaker.state != 'closed'
+
+
+@responses.activate
+def test_last_try_takes_no_retry_token():
+    responses.add(responses.GET, URL, body='oops', status=500, headers={'Retry-After': '0'})
+    budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=5)
+    geocoder = OpenCageGeocode('abcde', retry_budget=budget)
+
+    with pytest.raises(UnknownError):
+        geocoder.geocode('one')
+
+    assert len(responses.calls) == 5
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+@responses.activate
+def test_retry_budget_limits_retries():
+    responses.add(responses.GET, URL, body='oops', status=500)
+    geocoder = OpenCageGeocode('abcde', retry_budget=RetryBudget(ratio=0, min_per_second=0, max_tokens=1))
+
+    with pytest.raises(UnknownError):
+        geocoder.geocode('one')
+    assert len(responses.calls) == 2
+
+    with pytest.raises(UnknownError):
+        geocoder.geocode('two')
+    assert len(responses.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_breaker(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.Response(text='oops', status=500)
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', domain=domain, protocol='http',
+                               circuit_breaker=CircuitBreaker(failure_threshold=1)) as geocoder:
+        with pytest.raises(UnknownError):
+            await geocoder.geocode_async('one')
+        with pytest.raises(CircuitOpenError):
+            await geocoder.geocode_async('two')
+
+    assert calls == 1
@@ -0,0 +1,143 @@
+# encoding: utf-8
+
+from pathlib import Path
+
+import json
+import math
+
+import pytest
+import responses
+
+from opencage.geocoder import OpenCageGeocode, UnknownError, floatify_latlng
+from opencage.results import Bounds, Geometry, Result, ResultColumns
+
+geocoder = OpenCageGeocode('abcde')
+
+
+def _fixture_results(name):
+    return json.loads(Path('test/fixtures', name).read_text(encoding="utf-8"))['results']
+
+
+def test_result_from_dict():
+    result = Result.from_dict(_fixture_results('uk_postcode.json')[0])
+
+    assert result.geometry == Geometry(51.5221558691, -0.100838524406)
+    assert isinstance(result.geometry.lat, float)
+    assert result.components['locality'] == 'Clerkenwell'
+    assert result.components.locality == 'Clerkenwell'
+    assert result.components.village is None
+    assert result.formatted == 'Clerkenwell, Islington, United Kingdom'
+    assert result.annotations == {}
+
+
+def test_annotations_not_copied():
+    raw = {'formatted': 'x', 'annotations': {'timezone': {'name': 'Europe/London'}, 'currency': {'iso_code': 'GBP'}}}
+    result = Result.from_dict(raw)
+
+    assert result.annotations is raw['annotations']
+    assert result.annotations['currency']['iso_code'] == 'GBP'
+    assert result.extra == {'annotations': raw['annotations']}
+
+
+def test_bounds():
+    result = Result.from_dict(_fixture_results('muenster.json')[0])
+
+    assert isinstance(result.bounds, Bounds)
+    assert result.bounds.northeast == Geometry(52.0600251, 7.7743634)
+
+
+def test_to_dict_round_trip():
+    for raw in _fixture_results('donostia.json'):
+        assert Result.from_dict(raw).to_dict() == floatify_latlng(raw)
+
+
+def test_slots():
+    result = Result.from_dict({'geometry': {'lat': 1, 'lng': 2}})
+    with pytest.raises(AttributeError):
+        result.something = 1
+    assert result.bounds is None
+    assert result.annotations == {}
+
+
+@responses.activate
+def test_geocode_result_type_objects():
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    results = geocoder.geocode("EC1M 5RF", result_type='objects')
+    assert all(isinstance(result, Result) for result in results)
+    assert 'result_type' not in responses.calls[-1].request.url
+
+    results = geocoder.reverse_geocode(51.5221558691, -0.100838524406, result_type='objects')
+    assert isinstance(results[0], Result)
+
+
+def test_invalid_result_type():
+    with pytest.raises(ValueError):
+        geocoder.geocode("EC1M 5RF", result_type='tuples')
+
+
+def test_columns_from_dicts_objects_and_errors():
+    columns = ResultColumns(components=('country_code', 'city'))
+    raw = _fixture_results('muenster.json')
+
+    columns.append(floatify_latlng(raw))
+    columns.append([Result.from_dict(raw[1])])
+    columns.append([])
+    columns.add_response({'results': raw})
+    columns.append(UnknownError('500 status code from API'))
+
+    assert len(columns) == 5
+    assert columns.lat[0] == 51.9625101
+    assert columns.lng[1] == -8.5708973
+    assert math.isnan(columns.lat[2]) and math.isnan(columns.lat[4])
+    assert columns.formatted[2] is None
+    assert columns.components['country_code'][0] == 'de'
+    assert list(columns.columns()) == ['lat', 'lng', 'confidence', 'formatted', 'country_code', 'city']
+
+
+def test_columns_to_numpy():
+    numpy = pytest.importorskip('numpy')
+    columns = ResultColumns()
+    columns.append([{'geometry': {'lat': 1.5, 'lng': 2.5}, 'confidence': 9, 'components': {'country_code': 'gb'}}])
+
+    arrays = columns.to_numpy()
+    assert arrays['lat'].dtype == numpy.float64
+    assert arrays['lat'][0] == 1.5
+    assert arrays['country_code'][0] == 'gb'
+
+    # the copies don't keep the collector from growing
+    columns.append([])
+    assert len(columns) == 2
+    assert len(arrays['lat']) == 1
+
+    views = columns.to_numpy(copy=False)
+    assert views['lat'][0] == 1.5
+    with pytest.raises(BufferError):
+        columns.append([])
+
+
+def test_columns_to_pandas():
+    pytest.importorskip('pandas')
+    columns = ResultColumns()
+    columns.append([{'geometry': {'lat': 1.5, 'lng': 2.5}}])
+
+    frame = columns.to_pandas()
+    assert list(frame.columns) == ['lat', 'lng', 'confidence', 'formatted', 'country_code']
+    assert frame['lng'][0] == 2.5
+
+
+def test_columns_to_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    columns = ResultColumns()
+    columns.append([{'geometry': {'lat': 1.5, 'lng': 2.5}, 'formatted': 'somewhere'}])
+    columns.to_parquet(str(tmp_path / 'out.parquet'))
+
+    table = pyarrow.parquet.read_table(str(tmp_path / 'out.parquet'))
+    assert table.column('formatted').to_pylist() == ['somewhere']
@@ -0,0 +1,124 @@
+# encoding: utf-8
+
+from pathlib import Path
+
+import random
+
+import pytest
+import responses
+from aiohttp import web
+
+from opencage.cache import ReverseGeocodeCache, _distance_m
+from opencage.geocoder import OpenCageGeocode
+
+
+def test_same_grid_cell_is_a_hit():
+    cache = ReverseGeocodeCache(precision=3)
+    cache.set(51.50012, -0.10021, 'here')
+
+    assert cache.get(51.50034, -0.10044) == 'here'
+    assert cache.get(51.502, -0.10021) is None
+
+
+def test_params_key_must_match():
+    cache = ReverseGeocodeCache()
+    cache.set(51.5, -0.1, 'english', params_key='language=en')
+
+    assert cache.get(51.5, -0.1, params_key='language=en') == 'english'
+    assert cache.get(51.5, -0.1, params_key='language=de') is None
+
+
+def test_tolerance_returns_nearest_point_across_cells():
+    cache = ReverseGeocodeCache(precision=5, tolerance=50)
+    cache.set(51.50000, -0.10000, 'first')
+    cache.set(51.50030, -0.10000, 'second')
+
+    # ~22m north of 'first' and ~11m south of 'second', several cells apart
+    assert cache.get(51.50020, -0.10000) == 'second'
+    # ~111m away from both
+    assert cache.get(51.50130, -0.10000) is None
+
+
+def test_tolerance_near_the_pole():
+    cache = ReverseGeocodeCache(precision=4, tolerance=100)
+    cache.set(89.9, 10.0, 'pole')
+
+    # 0.05 degrees of longitude is only ~10m this far north
+    assert cache.get(89.9, 10.05) == 'pole'
+
+
+def test_tolerance_across_the_antimeridian():
+    cache = ReverseGeocodeCache(tolerance=100)
+    cache.set(10.0, 179.9997, 'east')
+
+    # ~66m away on the other side of the antimeridian
+    assert cache.get(10.0, -179.9997) == 'east'
+
+
+@pytest.mark.parametrize('tolerance', [50, 2000])
+def test_tolerance_matches_brute_force(tolerance):
+    rng = random.Random(0)
+    cache = ReverseGeocodeCache(tolerance=tolerance)
+    spread = tolerance * 3 / 111_000
+    points = []
+    for lat, lng in [(51.5, -0.1), (70.0, 179.99), (-89.9, 0.0)]:
+        for _ in range(100):
+            point = (max(-90, min(90, lat + rng.uniform(-spread, spread))),
+                     (lng + rng.uniform(-spread, spread) * 10 + 180) % 360 - 180)
+            points.append(point)
+            cache.set(*point, point)
+
+    for _ in range(300):
+        lat, lng = rng.choice(points)
+        lat = max(-90, min(90, lat + rng.uniform(-spread, spread)))
+        lng = (lng + rng.uniform(-spread, spread) * 5 + 180) % 360 - 180
+        nearest = min(points, key=lambda point: _distance_m(lat, lng, *point))
+        expected = nearest if _distance_m(lat, lng, *nearest) <= tolerance else None
+        assert cache.get(lat, lng) == expected
+
+
+def test_lru_eviction():
+    cache = ReverseGeocodeCache(maxsize=1)
+    cache.set(1, 1, 'a')
+    cache.set(2, 2, 'b')
+
+    assert cache.get(1, 1) is None
+    assert cache.get(2, 2) == 'b'
+    assert len(cache) == 1
+
+
+@responses.activate
+def test_sync_nearby_points_share_request():
+    geocoder = OpenCageGeocode('abcde', reverse_cache=True)
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/muenster.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    first = geocoder.reverse_geocode(51.95262, 7.63239)
+    second = geocoder.reverse_geocode(51.95264, 7.63241)
+    raw = geocoder.reverse_geocode(51.95264, 7.63241, raw_response=True)
+
+    assert first == second
+    assert 'results' in raw
+    assert len(responses.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_nearby_points_share_request(mock_api):
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.json_response({'results': [{'formatted': request.query['q']}]})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain, reverse_cache=True) as geocoder:
+        first = await geocoder.reverse_geocode_async(51.95262, 7.63239)
+        second = await geocoder.reverse_geocode_async(51.95264, 7.63241)
+
+    assert first == second == [{'formatted': '51.95262,7.63239'}]
+    assert calls == 1
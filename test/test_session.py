@@ -1,11 +1,16 @@
 # encoding: utf-8
 
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+import os
+import threading
+
 import pytest
 import responses
 
-from opencage.geocoder import OpenCageGeocode
+from opencage.geocoder import OpenCageGeocode, _get_shared_session
 from opencage.geocoder import NotAuthorizedError
 
 
@@ -44,3 +49,120 @@ def test_failure():
         with pytest.raises(NotAuthorizedError) as excinfo:
             geocoder.geocode("whatever")
         assert str(excinfo.value) == 'Your API key is not authorized. You may have entered it incorrectly.'
+
+
+def test_shared_session_reused_outside_with():
+    assert _get_shared_session() is _get_shared_session()
+
+
+def test_shared_session_recreated_after_fork(monkeypatch):
+    session = _get_shared_session()
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert _get_shared_session() is not session
+
+
+def test_pool_size():
+    with OpenCageGeocode('abcde', pool_size=25) as geocoder:
+        adapter = geocoder.session.get_adapter(geocoder.url)
+        assert adapter._pool_maxsize == 25
+
+
+@pytest.mark.asyncio
+async def test_async_connector_options():
+    async with OpenCageGeocode('abcde', pool_size=25, keepalive_timeout=60, dns_cache_ttl=300,
+                               limit_per_host=5) as geocoder:
+        connector = geocoder.session.connector
+        assert connector.limit == 25
+        assert connector.limit_per_host == 5
+        assert connector._keepalive_timeout == 60
+        assert connector._cached_hosts._ttl == 300
+
+
+@responses.activate
+def test_thread_safe_client_shared_between_threads():
+    geocoder = OpenCageGeocode('abcde', thread_safe=True, pool_size=8)
+    responses.add(
+        responses.GET,
+        geocoder.url,
+        body=Path('test/fixtures/uk_postcode.json').read_text(encoding="utf-8"),
+        status=200
+    )
+
+    def geocode_in_with_block(query):
+        # overlapping `with` blocks are fine in thread-safe mode
+        with geocoder:
+            return geocoder.geocode(query)
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(geocode_in_with_block, ["EC1M 5RF"] * 16))
+
+    assert all(_any_result_around(r, lat=51.5201666, lon=-0.0985142) for r in results)
+    session = geocoder._default_session()
+    assert session is not _get_shared_session()
+    assert session.get_adapter(geocoder.url)._pool_maxsize == 8
+    assert geocoder.session is None
+
+
+def test_thread_safe_session_recreated_after_close_and_fork(monkeypatch):
+    geocoder = OpenCageGeocode('abcde', thread_safe=True)
+    session = geocoder._default_session()
+    assert geocoder._default_session() is session
+
+    geocoder.close()
+    reopened = geocoder._default_session()
+    assert reopened is not session
+
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert geocoder._default_session() is not reopened
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b'{"results": [], "status": {"code": 200}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def keepalive_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_kept_for_each_domain(keepalive_server):
+    port = keepalive_server.server_address[1]
+    # two names for the same server, so requests switch between two host pools
+    domains = [f'localhost:{port}', f'0.0.0.0:{port}']
+
+    with OpenCageGeocode('abcde', protocol='http', domain=domains) as geocoder:
+        for _ in range(40):
+            geocoder.geocode('x')
+
+    assert len(keepalive_server.connections) <= 2
+
+
+def test_shared_session_for_more_domains():
+    session = _get_shared_session()
+    adapter = session.get_adapter('https://api.opencagedata.com')
+
+    more = _get_shared_session(hosts=3)
+    assert more is not session
+    assert more is _get_shared_session(hosts=3)
+    assert more.get_adapter('https://api.opencagedata.com')._pool_connections == 3
+
+    # the session already in use keeps its adapter and connections
+    assert session.get_adapter('https://api.opencagedata.com') is adapter
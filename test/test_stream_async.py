@@ -0,0 +1,106 @@
+# encoding: utf-8
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from opencage.geocoder import OpenCageGeocode, AioHttpError, NotAuthorizedError
+
+
+async def _queries(items, pulled=None):
+    for item in items:
+        if pulled is not None:
+            pulled.append(item)
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_yields_pairs_in_completion_order(mock_api):
+    async def handler(request):
+        query = request.query['q']
+        # answer later queries first
+        await asyncio.sleep(0.02 * (3 - int(query)))
+        return web.json_response({'results': [{'formatted': query, 'geometry': {'lat': '1.5', 'lng': '2'}}]})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        pairs = [pair async for pair in geocoder.geocode_stream_async(_queries(['0', '1', '2']), concurrency=3)]
+
+    assert [query for query, _ in pairs] == ['2', '1', '0']
+    assert all(results[0]['formatted'] == query for query, results in pairs)
+    assert pairs[0][1][0]['geometry'] == {'lat': 1.5, 'lng': 2.0}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_yielded(mock_api):
+    async def handler(request):
+        if request.query['q'] == 'bad':
+            return web.json_response({'status': {'code': 401}}, status=401)
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        pairs = dict([pair async for pair in geocoder.geocode_stream_async(['good', 'bad'])])
+
+    assert pairs['good'] == []
+    assert isinstance(pairs['bad'], NotAuthorizedError)
+
+
+@pytest.mark.asyncio
+async def test_back_pressure(mock_api):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    pulled = []
+    yielded = 0
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        async for _ in geocoder.geocode_stream_async(_queries([str(i) for i in range(30)], pulled), concurrency=3):
+            yielded += 1
+            # the input is only read as far as there are free slots
+            assert len(pulled) <= yielded + 3
+
+    assert yielded == 30
+    assert peak <= 3
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_requests_in_flight(mock_api):
+    started = 0
+    release = asyncio.Event()
+
+    async def handler(request):
+        nonlocal started
+        started += 1
+        if request.query['q'] != 'fast':
+            await release.wait()
+        return web.json_response({'results': []})
+
+    domain = await mock_api(handler)
+    async with OpenCageGeocode('abcde', protocol='http', domain=domain) as geocoder:
+        stream = geocoder.geocode_stream_async(['slow', 'fast', 'slow', 'slow'], concurrency=3)
+        query, _ = await stream.__anext__()
+        assert query == 'fast'
+        await stream.aclose()
+
+        leftover = [task for task in asyncio.all_tasks() if 'geocode_async' in task.get_coro().__qualname__]
+        assert leftover == []
+        release.set()
+
+    assert started <= 3
+
+
+@pytest.mark.asyncio
+async def test_requires_async_session():
+    geocoder = OpenCageGeocode('abcde')
+    with pytest.raises(AioHttpError):
+        await geocoder.geocode_stream_async(['x']).__anext__()